@@ -0,0 +1,63 @@
+"""
+Выполнение блокирующего кода (ORM, xlrd, requests) из async-представлений
+и асинхронной загрузки.
+
+Блокирующие вызовы идут в общий ограниченный пул потоков
+ASYNC_BLOCKING_WORKERS, поэтому цикл событий не блокируется, а число
+одновременных соединений с БД ограничено. Записи в БД идут через отдельный
+пул из одного потока: у SQLite один писатель, и очередь записей лучше
+держать в приложении, чем в ожидании блокировки.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_blocking_executor: ThreadPoolExecutor | None = None
+_writer_executor: ThreadPoolExecutor | None = None
+
+
+def blocking_executor() -> ThreadPoolExecutor:
+    global _blocking_executor
+    if _blocking_executor is None:
+        _blocking_executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "ASYNC_BLOCKING_WORKERS", 8), thread_name_prefix="blocking"
+        )
+    return _blocking_executor
+
+
+def writer_executor() -> ThreadPoolExecutor:
+    global _writer_executor
+    if _writer_executor is None:
+        _writer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+    return _writer_executor
+
+
+def _call(func, *args, **kwargs):
+    # Потоки пула живут долго: соединения с истёкшим CONN_MAX_AGE закрываются,
+    # как в начале обычного запроса
+    close_old_connections()
+    return func(*args, **kwargs)
+
+
+async def run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor(), functools.partial(_call, func, *args, **kwargs))
+
+
+async def run_write(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(writer_executor(), functools.partial(_call, func, *args, **kwargs))
+
+
+async def aread_file(f, chunk_size: int = 64 * 1024):
+    """
+    Асинхронное чтение открытого файла кусками; файл закрывается в конце.
+    """
+    try:
+        while chunk := await run_blocking(f.read, chunk_size):
+            yield chunk
+    finally:
+        await run_blocking(f.close)
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class DjangoParserConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "django_parser"
+
+    def ready(self):
+        from .sqlite import apply_sqlite_pragmas
+        from .tiers import install_tier_attacher
+
+        connection_created.connect(apply_sqlite_pragmas, dispatch_uid="django_parser_sqlite_pragmas")
+        connection_created.connect(install_tier_attacher, dispatch_uid="django_parser_tier_attacher")
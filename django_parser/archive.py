@@ -0,0 +1,113 @@
+"""
+Архив нормализованных строк отчётов в Parquet.
+
+Каждый разобранный отчёт один раз записывается в
+SPIMEX_ARCHIVE_DIR/ГГГГ-ММ/ГГГГ-ММ-ДД.parquet (zstd, колонки как в выгрузке
+/export/). По архиву снимки восстанавливаются без xlrd
+(`manage.py reingest_archive`): файлы читаются через memory map, строки
+получаются сразу в типах полей модели. pyarrow — необязательная зависимость.
+"""
+import os
+import re
+from datetime import date
+
+from django.conf import settings
+
+from .export import EXPORT_FIELDS, parquet_schema
+
+
+# Хэш исходного XLS в метаданных файла: повторно тот же отчёт не пишется
+SOURCE_HASH_KEY = b"source_hash"
+
+MONTH_DIR_RE = re.compile(r"^\d{4}-\d{2}$")
+REPORT_FILE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.parquet$")
+
+
+class ArchiveDependencyError(Exception):
+    """Для архива отчётов не установлен pyarrow."""
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ArchiveDependencyError("Для архива отчётов нужен пакет pyarrow") from e
+    return pa, pq
+
+
+def archive_dir() -> str | None:
+    path = getattr(settings, "SPIMEX_ARCHIVE_DIR", None)
+    return os.fspath(path) if path else None
+
+
+def report_path(d: date, root: str | None = None) -> str:
+    return os.path.join(root or archive_dir(), f"{d:%Y-%m}", f"{d.isoformat()}.parquet")
+
+
+def archived_hash(path: str) -> str | None:
+    _, pq = _pyarrow()
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+    except OSError:
+        return None
+    value = metadata.get(SOURCE_HASH_KEY)
+    return value.decode() if value else None
+
+
+def write_report(d: date, records: list[dict], source_hash: str = "") -> str | None:
+    """
+    Записывает строки отчёта за дату d. Возвращает путь к файлу или None,
+    если архив отключён или этот отчёт (по хэшу исходника) уже записан.
+    Файл пишется во временный и переименовывается, поэтому читатели не
+    видят недописанных файлов.
+    """
+    if not archive_dir():
+        return None
+    pa, pq = _pyarrow()
+    path = report_path(d)
+    if source_hash and archived_hash(path) == source_hash:
+        return None
+
+    schema = parquet_schema().with_metadata({SOURCE_HASH_KEY: source_hash.encode()})
+    table = pa.Table.from_pylist([{**record, "date": d} for record in records], schema=schema)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+    return path
+
+
+def archived_reports(date_from: date | None = None, date_to: date | None = None,
+                     root: str | None = None) -> list[tuple[date, str]]:
+    """
+    (дата, путь) архивных отчётов в диапазоне, по возрастанию даты.
+    Каталоги месяцев вне диапазона не просматриваются.
+    """
+    root = root or archive_dir()
+    if not root or not os.path.isdir(root):
+        return []
+    reports = []
+    for month in sorted(os.listdir(root)):
+        if not MONTH_DIR_RE.match(month):
+            continue
+        if (date_from and month < f"{date_from:%Y-%m}") or (date_to and month > f"{date_to:%Y-%m}"):
+            continue
+        for name in sorted(os.listdir(os.path.join(root, month))):
+            m = REPORT_FILE_RE.match(name)
+            if not m:
+                continue
+            d = date.fromisoformat(m.group(1))
+            if (date_from is None or d >= date_from) and (date_to is None or d <= date_to):
+                reports.append((d, os.path.join(root, month, name)))
+    return reports
+
+
+def read_report(path: str) -> list[dict]:
+    """
+    Строки отчёта в том же виде, что возвращает разбор XLS (без даты):
+    Decimal, int, str и None.
+    """
+    _, pq = _pyarrow()
+    table = pq.read_table(path, columns=[name for name in EXPORT_FIELDS if name != "date"], memory_map=True)
+    return table.to_pylist()
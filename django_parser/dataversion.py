@@ -0,0 +1,26 @@
+"""
+Версия данных для кэширования страниц и условных ответов (ETag/Last-Modified).
+"""
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DataVersion
+
+DATA_VERSION_PK = 1
+
+
+def bump_data_version():
+    """
+    Увеличивает версию; вызывается в транзакции, меняющей данные,
+    поэтому новая версия видна вместе с новыми данными.
+    """
+    updated = DataVersion.objects.filter(pk=DATA_VERSION_PK).update(
+        version=F("version") + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        DataVersion.objects.get_or_create(pk=DATA_VERSION_PK, defaults={"version": 1})
+
+
+def current_data_version() -> DataVersion:
+    version = DataVersion.objects.filter(pk=DATA_VERSION_PK).first()
+    return version or DataVersion(pk=DATA_VERSION_PK, version=0, updated_at=None)
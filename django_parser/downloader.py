@@ -0,0 +1,174 @@
+"""
+Загрузка XLS-отчётов SPIMEX (oil_xls).
+
+Все запросы идут через одну requests.Session с общим пулом keep-alive
+соединений, таймаутом на запрос и повторами с экспоненциальной задержкой.
+Несколько дат скачиваются параллельно в ограниченном пуле потоков.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+
+DEFAULT_BASE_URL = "https://spimex.com/files/trades/result/upload/reports/oil_xls"
+
+
+def build_ts(d) -> str:
+    return f"{d:%Y%m%d}"
+
+
+def report_filename(d: date) -> str:
+    return f"oil_xls_{build_ts(d)}162000.xls"
+
+
+@dataclass
+class DownloadResult:
+    """
+    Результат скачивания отчёта за одну дату.
+    status — HTTP-код ответа или None, если запрос не удался после всех повторов;
+    304 означает, что отчёт не изменился с прошлой загрузки.
+    """
+    date: date
+    url: str
+    status: int | None = None
+    content: bytes | None = None
+    path: str | None = None
+    elapsed: float = 0.0
+    error: str | None = None
+    etag: str = ""
+    last_modified: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200 and self.content is not None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+def build_session(pool_size: int, retries: int, backoff_factor: float) -> requests.Session:
+    """
+    Создаёт сессию с пулом соединений на pool_size хостов/потоков и повторами
+    для сетевых ошибок и ответов 429/5xx. 404 не повторяется — это неторговый день.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class ReportDownloader:
+    """
+    Параллельный загрузчик отчётов.
+
+        with ReportDownloader() as downloader:
+            for result in downloader.fetch_many(dates):
+                ...
+
+    Параметры по умолчанию берутся из настроек SPIMEX_*; base_url можно
+    подменить на адрес локального тестового HTTP-сервера.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        max_workers: int | None = None,
+        timeout: float | tuple[float, float] | None = None,
+        retries: int | None = None,
+        backoff_factor: float | None = None,
+        download_dir: str | os.PathLike | None = None,
+    ):
+        self.base_url = (base_url or getattr(settings, "SPIMEX_REPORTS_URL", DEFAULT_BASE_URL)).rstrip("/")
+        self.max_workers = max_workers or getattr(settings, "SPIMEX_DOWNLOAD_WORKERS", 8)
+        self.timeout = timeout or getattr(settings, "SPIMEX_DOWNLOAD_TIMEOUT", (5, 30))
+        if retries is None:
+            retries = getattr(settings, "SPIMEX_DOWNLOAD_RETRIES", 3)
+        if backoff_factor is None:
+            backoff_factor = getattr(settings, "SPIMEX_DOWNLOAD_BACKOFF", 0.5)
+        if download_dir is None:
+            download_dir = getattr(settings, "SPIMEX_DOWNLOAD_DIR", "download")
+        self.download_dir = download_dir
+        self.session = build_session(self.max_workers, retries, backoff_factor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def url_for(self, d: date) -> str:
+        return f"{self.base_url}/{report_filename(d)}"
+
+    def fetch(self, d: date, headers: dict[str, str] | None = None) -> DownloadResult:
+        """
+        Скачивает отчёт за дату d. Сетевые ошибки не пробрасываются,
+        а записываются в result.error, чтобы одна дата не прерывала остальные.
+        headers — дополнительные заголовки запроса, например If-None-Match.
+        """
+        result = DownloadResult(date=d, url=self.url_for(d))
+        started = time.perf_counter()
+        try:
+            r = self.session.get(result.url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            result.error = str(e)
+            metrics.download_seconds.observe(time.perf_counter() - started, status="error")
+            return result
+        metrics.download_seconds.observe(time.perf_counter() - started, status=r.status_code)
+        metrics.download_bytes.inc(len(r.content))
+
+        result.status = r.status_code
+        result.elapsed = r.elapsed.total_seconds()
+        result.etag = r.headers.get("ETag", "")
+        result.last_modified = r.headers.get("Last-Modified", "")
+        if r.status_code == 200:
+            result.content = r.content
+            if self.download_dir:
+                result.path = self.save(d, result.content)
+        return result
+
+    def save(self, d: date, content: bytes) -> str:
+        os.makedirs(self.download_dir, exist_ok=True)
+        out_path = os.path.join(self.download_dir, report_filename(d))
+        with open(out_path, "wb") as f:
+            f.write(content)
+        return out_path
+
+    def fetch_many(self, dates, headers: dict[date, dict[str, str]] | None = None):
+        """
+        Скачивает отчёты за все даты не более чем в max_workers потоков
+        и отдаёт результаты по мере готовности.
+        headers — заголовки запроса по датам (для условных запросов).
+        """
+        dates = list(dates)
+        if not dates:
+            return
+        headers = headers or {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(dates))) as pool:
+            futures = [pool.submit(self.fetch, d, headers.get(d)) for d in dates]
+            for future in as_completed(futures):
+                yield future.result()
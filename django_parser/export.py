@@ -0,0 +1,223 @@
+"""
+Потоковая выгрузка снимков в CSV, Parquet и XLSX.
+
+Строки читаются из БД серверным курсором (values_list().iterator) пачками
+по EXPORT_CHUNK_SIZE, поэтому память не зависит от объёма выгрузки.
+CSV и Parquet отдаются по мере чтения; XLSX (zip-архив) собирается во
+временном файле на диске. pyarrow и openpyxl — необязательные зависимости.
+
+stream_* — генераторы для WSGI. astream_* — для ASGI: пачки читаются
+постранично по ключу сортировки (KeysetPaginator), каждая пачка — отдельный
+запрос в пуле потоков, без курсора, привязанного к одному потоку.
+"""
+import csv
+import io
+import tempfile
+from itertools import islice
+
+from django.conf import settings
+from django.db import models
+
+from .aio import run_blocking
+from .fields import FixedPointField
+from .models import MarketInstrumentSnapshot
+from .pagination import KeysetPaginator
+
+
+# Порядок колонок как в таблице на главной странице
+EXPORT_FIELDS = [
+    "instrument_code", "instrument_name", "delivery_basis", "contracts_volume_ei",
+    "contracts_volume_rub", "market_change_rub", "market_change_pct", "min_price",
+    "avg_price", "max_price", "market_price", "best_offer", "best_bid",
+    "contracts_count", "date", "product",
+]
+
+# Строк на листе XLSX без строки заголовка
+XLSX_MAX_ROWS = 1_048_575
+
+
+class ExportDependencyError(Exception):
+    """Для формата выгрузки не установлен нужный пакет."""
+
+
+def export_headers() -> list[str]:
+    return [str(MarketInstrumentSnapshot._meta.get_field(name).verbose_name) for name in EXPORT_FIELDS]
+
+
+def chunk_size() -> int:
+    return getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+
+
+def iter_rows(queryset):
+    return queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size())
+
+
+def iter_chunks(queryset):
+    rows = iter_rows(queryset)
+    while chunk := list(islice(rows, chunk_size())):
+        yield chunk
+
+
+async def aiter_chunks(queryset, ordering: list[str]):
+    paginator = KeysetPaginator(queryset, chunk_size(), ordering)
+    cursor = None
+    while True:
+        page = await run_blocking(paginator.page, cursor)
+        if page.object_list:
+            yield [tuple(getattr(obj, name) for name in EXPORT_FIELDS) for obj in page]
+        if not page.has_next():
+            break
+        cursor = page.next_cursor
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+class CsvEncoder:
+    """
+    CSV в UTF-8 с BOM (чтобы Excel распознал кириллицу).
+    Заголовок отдаётся до выполнения запроса.
+    """
+
+    def __init__(self):
+        self.writer = csv.writer(_Echo())
+
+    def header(self) -> str:
+        return "\ufeff" + self.writer.writerow(export_headers())
+
+    def encode(self, chunk) -> str:
+        return "".join(self.writer.writerow(row) for row in chunk)
+
+    def close(self) -> str:
+        return ""
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Файл, накапливающий записанные байты до следующего drain().
+    """
+
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.parts.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    types = []
+    for name in EXPORT_FIELDS:
+        field = MarketInstrumentSnapshot._meta.get_field(name)
+        internal = field.get_internal_type()
+        if isinstance(field, (models.DecimalField, FixedPointField)):
+            types.append(pa.field(name, pa.decimal128(field.max_digits, field.decimal_places)))
+        elif internal == "DateField":
+            types.append(pa.field(name, pa.date32()))
+        elif internal.endswith("IntegerField"):
+            types.append(pa.field(name, pa.int64()))
+        else:
+            types.append(pa.field(name, pa.string()))
+    return pa.schema(types)
+
+
+class ParquetEncoder:
+    """
+    Каждая пачка строк — отдельная группа строк Parquet; байты отдаются
+    сразу после записи группы, футер — в конце.
+    """
+
+    def __init__(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ExportDependencyError("Для выгрузки в Parquet нужен пакет pyarrow") from e
+        self.pa = pa
+        self.schema = parquet_schema()
+        self.sink = _ChunkSink()
+        self.writer = pq.ParquetWriter(self.sink, self.schema)
+
+    def header(self) -> bytes:
+        return self.sink.drain()
+
+    def encode(self, chunk) -> bytes:
+        self.writer.write_table(self.pa.Table.from_pylist(
+            [dict(zip(EXPORT_FIELDS, row)) for row in chunk], schema=self.schema
+        ))
+        return self.sink.drain()
+
+    def close(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+
+def _stream(encoder, chunks):
+    yield encoder.header()
+    for chunk in chunks:
+        yield encoder.encode(chunk)
+    yield encoder.close()
+
+
+async def _astream(encoder, chunks):
+    yield encoder.header()
+    async for chunk in chunks:
+        yield encoder.encode(chunk)
+    yield encoder.close()
+
+
+def stream_csv(queryset):
+    return _stream(CsvEncoder(), iter_chunks(queryset))
+
+
+def stream_parquet(queryset):
+    return _stream(ParquetEncoder(), iter_chunks(queryset))
+
+
+def astream_csv(queryset, ordering: list[str]):
+    return _astream(CsvEncoder(), aiter_chunks(queryset, ordering))
+
+
+def astream_parquet(queryset, ordering: list[str]):
+    return _astream(ParquetEncoder(), aiter_chunks(queryset, ordering))
+
+
+def write_xlsx(queryset):
+    """
+    Книга XLSX во временном файле (openpyxl в режиме write_only).
+    Строки сверх предела листа Excel переносятся на следующий лист.
+    Возвращает открытый файл, установленный на начало.
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError as e:
+        raise ExportDependencyError("Для выгрузки в XLSX нужен пакет openpyxl") from e
+
+    wb = Workbook(write_only=True)
+    headers = export_headers()
+    sheet, rows_on_sheet = None, XLSX_MAX_ROWS
+    for row in iter_rows(queryset):
+        if rows_on_sheet >= XLSX_MAX_ROWS:
+            sheet = wb.create_sheet(f"Данные {len(wb.sheetnames) + 1}")
+            sheet.append(headers)
+            rows_on_sheet = 0
+        sheet.append(row)
+        rows_on_sheet += 1
+    if sheet is None:
+        wb.create_sheet("Данные 1").append(headers)
+
+    out = tempfile.TemporaryFile()
+    wb.save(out)
+    out.seek(0)
+    return out
@@ -0,0 +1,118 @@
+"""
+Десятичное поле, хранящееся целым числом.
+
+FixedPointField хранит значение в BIGINT в единицах 10**-decimal_places
+(копейки, миллионные доли тонны и рубля), а в Python отдаёт Decimal, как
+DecimalField. Сортировка, диапазоны, SUM, MIN и MAX выполняются в БД над
+целыми: без REAL/TEXT-представлений SQLite и без потери точности, а строки
+и индексы меньше. Значения фильтров (Decimal, int, float, str) масштабируются
+при подготовке запроса.
+"""
+from decimal import ROUND_HALF_EVEN, Decimal, DecimalException
+
+from django import forms
+from django.core import checks, exceptions, validators
+from django.db import models
+from django.utils.functional import cached_property
+
+
+# Десятичных цифр, которые всегда помещаются в знаковое 64-битное целое
+MAX_DIGITS_LIMIT = 18
+
+
+class FixedPointField(models.Field):
+    description = "Десятичное число с фиксированной точкой, хранящееся целым"
+    empty_strings_allowed = False
+    default_error_messages = {
+        "invalid": "Значение «%(value)s» должно быть десятичным числом.",
+        "out_of_range": "Значение «%(value)s» не помещается в %(max_digits)s цифр, из них %(decimal_places)s после запятой.",
+    }
+
+    def __init__(self, verbose_name=None, name=None, max_digits=MAX_DIGITS_LIMIT, decimal_places=0, **kwargs):
+        self.max_digits, self.decimal_places = max_digits, decimal_places
+        super().__init__(verbose_name, name, **kwargs)
+
+    def check(self, **kwargs):
+        errors = super().check(**kwargs)
+        if not 0 <= self.decimal_places <= self.max_digits <= MAX_DIGITS_LIMIT:
+            errors.append(checks.Error(
+                f"Нужно 0 <= decimal_places <= max_digits <= {MAX_DIGITS_LIMIT}",
+                obj=self,
+                id="django_parser.E001",
+            ))
+        return errors
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs["max_digits"] = self.max_digits
+        kwargs["decimal_places"] = self.decimal_places
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        return "BigIntegerField"
+
+    @cached_property
+    def scale(self) -> int:
+        return 10 ** self.decimal_places
+
+    @cached_property
+    def quantum(self) -> Decimal:
+        return Decimal(1).scaleb(-self.decimal_places)
+
+    @cached_property
+    def validators(self):
+        return [*super().validators, validators.DecimalValidator(self.max_digits, self.decimal_places)]
+
+    @cached_property
+    def limit(self) -> int:
+        # Наибольшее по модулю значение в единицах хранения плюс один
+        return 10 ** self.max_digits
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            if isinstance(value, float):
+                return Decimal(repr(value)).quantize(self.quantum, ROUND_HALF_EVEN)
+            return Decimal(value).quantize(self.quantum, ROUND_HALF_EVEN)
+        except (DecimalException, TypeError, ValueError):
+            raise exceptions.ValidationError(
+                self.error_messages["invalid"], code="invalid", params={"value": value}
+            )
+
+    def get_prep_value(self, value):
+        """
+        Значение в единицах хранения. Не помещающееся в max_digits (в том числе
+        значение фильтра или курсора) — ValidationError, а не переполнение в БД.
+        """
+        original = value
+        value = self.to_python(super().get_prep_value(value))
+        if value is None:
+            return None
+        try:
+            scaled = int((value * self.scale).to_integral_value(ROUND_HALF_EVEN))
+        except DecimalException:
+            scaled = None
+        if scaled is None or abs(scaled) >= self.limit:
+            raise exceptions.ValidationError(
+                self.error_messages["out_of_range"],
+                code="out_of_range",
+                params={"value": original, "max_digits": self.max_digits, "decimal_places": self.decimal_places},
+            )
+        return scaled
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        if isinstance(value, float):
+            # AVG в БД возвращает дробное число единиц
+            return Decimal(repr(value)).scaleb(-self.decimal_places)
+        return Decimal(int(value)).scaleb(-self.decimal_places)
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{
+            "form_class": forms.DecimalField,
+            "max_digits": self.max_digits,
+            "decimal_places": self.decimal_places,
+            **kwargs,
+        })
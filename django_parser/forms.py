@@ -1,6 +1,31 @@
 from decimal import Decimal
 from django import forms
-from .models import MarketInstrumentSnapshot, Products
+from django.urls import reverse_lazy
+
+from .instruments import selected_choices
+from .models import Instrument, MarketInstrumentSnapshot, Products
+
+
+# Границы фильтра по цене совпадают с полем модели: значение за пределами
+# max_digits не пройдёт проверку формы и не дойдёт до запроса
+PRICE_FIELD = MarketInstrumentSnapshot._meta.get_field("market_price")
+
+
+class InstrumentChoiceField(forms.MultipleChoiceField):
+    """
+    Выбор инструментов без полного списка в форме: проверяются только
+    выбранные коды, остальные подгружаются поиском (instrument_search).
+    """
+
+    def validate(self, value):
+        if self.required and not value:
+            raise forms.ValidationError(self.error_messages["required"], code="required")
+        known = set(Instrument.objects.filter(code__in=value).values_list("code", flat=True))
+        for code in value:
+            if code not in known:
+                raise forms.ValidationError(
+                    self.error_messages["invalid_choice"], code="invalid_choice", params={"value": code}
+                )
 
 
 class SnapshotFilterForm(forms.Form):
@@ -15,26 +40,28 @@ class SnapshotFilterForm(forms.Form):
         widget=forms.DateInput(attrs={"type": "date"}),
     )
 
-    instrument_codes = forms.MultipleChoiceField(
+    instrument_codes = InstrumentChoiceField(
         label="Инструменты",
         required=False,
-        widget=forms.SelectMultiple(attrs={"size": "8", "class":"form-control"}),
+        widget=forms.SelectMultiple(attrs={
+            "size": "8", "class": "form-control", "data-search-url": reverse_lazy("instrument_search"),
+        }),
         choices=(),
     )
 
     price_from = forms.DecimalField(
         label="РынЦена от",
         required=False,
-        max_digits=20,
-        decimal_places=6,
+        max_digits=PRICE_FIELD.max_digits,
+        decimal_places=PRICE_FIELD.decimal_places,
         min_value=Decimal("0"),
         widget=forms.NumberInput(attrs={"step": "10000.00"}),
     )
     price_to = forms.DecimalField(
         label="РынЦена до",
         required=False,
-        max_digits=20,
-        decimal_places=6,
+        max_digits=PRICE_FIELD.max_digits,
+        decimal_places=PRICE_FIELD.decimal_places,
         min_value=Decimal("0"),
         widget=forms.NumberInput(attrs={"step": "10000.00"}),
     )
@@ -45,18 +72,23 @@ class SnapshotFilterForm(forms.Form):
         choices=(),
     )
 
+    q = forms.CharField(
+        label="Поиск",
+        required=False,
+        max_length=200,
+        widget=forms.TextInput(attrs={
+            "type": "search", "class": "form-control",
+            "placeholder": "наименование, базис поставки, товар",
+        }),
+    )
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        instruments = (
-            MarketInstrumentSnapshot.objects
-            .values_list("instrument_code", "instrument_name")
-            .distinct()
-            .order_by("instrument_code")
-        )
-        self.fields["instrument_codes"].choices = [
-            (code, f"{code} — {name}") for code, name in instruments
-        ]
+        # В <select> только выбранные инструменты: размер страницы и стоимость
+        # запроса не зависят от размера справочника
+        selected = self.data.getlist(self.add_prefix("instrument_codes")) if self.is_bound else []
+        self.fields["instrument_codes"].choices = selected_choices(selected)
 
         products = (
             Products.objects
@@ -0,0 +1,501 @@
+"""
+Конвейер загрузки отчётов SPIMEX: скачивание, разбор XLS и запись в БД.
+"""
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+
+from . import archive, metrics, workers
+from .aio import run_blocking, run_write
+from .dataversion import bump_data_version
+from .downloader import DownloadResult, ReportDownloader
+from .instruments import register_instruments
+from .models import MarketInstrumentSnapshot, ReportManifest
+from .normalize import CellError, normalize_report
+from .products import link_products
+from .rollups import update_rollups
+from .reports import ReportFormatError, read_report_rows
+from .revisions import record_revisions, snapshot_hash
+from .tiers import restore_dates
+
+
+def generate_dates(days: int = 10, direction: str = "past", start: date | None = None):
+    """
+    Генерирует даты, начиная со start (по умолчанию сегодня), включая start и days.
+    """
+
+    start = start or date.today()
+
+    step = -1 if direction == "past" else 1
+    for i in range(days + 1):
+        yield start + timedelta(days=step * i)
+
+def dash_to_none(v: any):
+    if v is None:
+        return None
+    if isinstance(v, str):
+        s = v.strip()
+        if s in {"-", ""}:
+            return None
+        return s
+    return v
+
+
+def to_decimal(v: any):
+    v = dash_to_none(v)
+    if v is None:
+        return None
+    if isinstance(v, Decimal):
+        return v
+    if isinstance(v, (int, float)):
+        return Decimal(str(v))
+
+    s = str(v).strip()
+    s = s.replace(" ", "").replace(",", ".")
+    try:
+        return Decimal(s)
+    except (InvalidOperation, ValueError) as e:
+        raise ValueError(f"Некорректное decimal значение: {v!r}") from e
+
+
+def to_int(v: any):
+    v = dash_to_none(v)
+    if v is None:
+        return None
+    if isinstance(v, int):
+        return v
+    s = str(v).strip().replace(" ", "")
+    try:
+        return int(s)
+    except ValueError as e:
+        raise ValueError(f"Некорректное int значение: {v!r}") from e
+
+
+
+SNAPSHOT_UNIQUE_FIELDS = ["instrument_code", "instrument_name", "date"]
+SNAPSHOT_UPDATE_FIELDS = [
+    f.name for f in MarketInstrumentSnapshot._meta.concrete_fields
+    if not f.primary_key and f.name not in SNAPSHOT_UNIQUE_FIELDS
+]
+
+
+def snapshot_fields(row: tuple[int, list], date_create) -> dict[str, any]:
+    """
+    Значения полей снимка из строки отчёта (номер строки, значения ячеек).
+    """
+    row = row[1]
+    instrument_code = row[1]
+    instrument_name = row[2]
+    dt = date_create
+
+    if not instrument_code or not instrument_name or dt is None:
+        raise ValueError(
+            "Обязательные поля instrument_code, instrument_name, date должны быть заданы"
+        )
+
+    product_name = row[2].split(",")[0]
+
+    return {
+        "instrument_code": instrument_code,
+        "instrument_name": instrument_name,
+        "date": dt,
+        "delivery_basis": dash_to_none(row[3]),
+        "contracts_volume_ei": to_decimal(row[4]),
+        "contracts_volume_rub": to_decimal(row[5]),
+        "market_change_rub": to_decimal(row[6]),
+        "market_change_pct": to_decimal(row[7]),
+        "min_price": to_decimal(row[8]),
+        "avg_price": to_decimal(row[9]),
+        "max_price": to_decimal(row[10]),
+        "market_price": to_decimal(row[11]),
+        "best_offer": to_decimal(row[12]),
+        "best_bid": to_decimal(row[13]),
+        "contracts_count": to_int(row[14]),
+        "product": product_name,
+    }
+
+
+@transaction.atomic
+def upsert_snapshot(row: tuple[int, list], date_create):
+    """
+    Записывает одну строку отчёта; неизменившаяся строка не перезаписывается.
+    """
+    values = snapshot_fields(row, date_create)
+    created, updated, _ = bulk_upsert_snapshots([MarketInstrumentSnapshot(**values)])
+    obj = MarketInstrumentSnapshot.objects.get(
+        **{name: values[name] for name in SNAPSHOT_UNIQUE_FIELDS}
+    )
+    if created:
+        link_products(MarketInstrumentSnapshot.objects.filter(pk=obj.pk))
+        register_instruments([values])
+    if created or updated:
+        bump_data_version()
+    return obj, bool(created)
+
+
+def snapshot_key(obj: MarketInstrumentSnapshot) -> tuple:
+    return obj.instrument_code, obj.instrument_name, obj.date
+
+
+@transaction.atomic
+def bulk_upsert_snapshots(snapshots, batch_size: int | None = None, source_hash: str = "") -> tuple[int, int, int]:
+    """
+    Записывает снимки одного или нескольких отчётов пачками
+    INSERT ... ON CONFLICT DO UPDATE в одной транзакции. Существующие строки
+    с тем же content_hash пропускаются, у изменившихся правки записываются
+    в SnapshotRevision (source_hash — хэш файла отчёта). Снимки дат,
+    перенесённых в архив, сначала возвращаются в основную таблицу.
+    При повторе ключа в исходных данных побеждает последняя строка.
+    Возвращает (создано, обновлено, без изменений).
+    """
+    batch_size = batch_size or getattr(settings, "INGEST_BATCH_SIZE", 500)
+    objs = list({snapshot_key(obj): obj for obj in snapshots}.values())
+    restore_dates({obj.date for obj in objs})
+
+    created = updated = 0
+    for i in range(0, len(objs), batch_size):
+        chunk = objs[i:i + batch_size]
+        existing = {
+            tuple(key): (pk, row_hash)
+            for *key, pk, row_hash in MarketInstrumentSnapshot.objects
+            .filter(
+                date__in={obj.date for obj in chunk},
+                instrument_code__in={obj.instrument_code for obj in chunk},
+            )
+            .values_list(*SNAPSHOT_UNIQUE_FIELDS, "pk", "content_hash")
+        }
+        new, changed = [], []
+        for obj in chunk:
+            obj.content_hash = snapshot_hash(obj)
+            current = existing.get(snapshot_key(obj))
+            if current is None:
+                new.append(obj)
+            elif current[1] != obj.content_hash:
+                changed.append((current[0], obj))
+        if not new and not changed:
+            continue
+
+        record_revisions(changed, source_hash)
+        MarketInstrumentSnapshot.objects.bulk_create(
+            new + [obj for _, obj in changed],
+            update_conflicts=True,
+            unique_fields=SNAPSHOT_UNIQUE_FIELDS,
+            update_fields=SNAPSHOT_UPDATE_FIELDS,
+        )
+        created += len(new)
+        updated += len(changed)
+    return created, updated, len(objs) - created - updated
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def load_manifest(dates) -> dict[date, ReportManifest]:
+    return {m.date: m for m in ReportManifest.objects.filter(date__in=list(dates))}
+
+
+def conditional_headers(entry: ReportManifest | None) -> dict[str, str]:
+    """
+    Заголовки условного GET для уже разобранного отчёта. Если прошлый разбор
+    не удался, отчёт запрашивается целиком.
+    """
+    if entry is None or not entry.is_parsed:
+        return {}
+    headers = {}
+    if entry.etag:
+        headers["If-None-Match"] = entry.etag
+    if entry.last_modified:
+        headers["If-Modified-Since"] = entry.last_modified
+    return headers
+
+
+def record_download(result: DownloadResult, entry: ReportManifest | None) -> ReportManifest:
+    """
+    Сохраняет в манифест итог запроса. 304 и сетевые ошибки не затирают
+    сведения о последней полученной версии файла.
+    """
+    if entry is None:
+        entry = ReportManifest(date=result.date)
+    if result.status is not None and not result.not_modified:
+        entry.status = result.status
+    if result.ok:
+        entry.etag = result.etag
+        entry.last_modified = result.last_modified
+        entry.size = len(result.content)
+        entry.content_hash = content_hash(result.content)
+    entry.save()
+    return entry
+
+
+def mark_parsed(entry: ReportManifest):
+    entry.parsed_hash = entry.content_hash
+    entry.save(update_fields=["parsed_hash", "checked_at"])
+
+
+def parse_report(source: bytes | str) -> tuple[list[dict], list[CellError]]:
+    """
+    Разбирает отчёт (содержимое или путь к файлу) без обращения к БД,
+    поэтому может выполняться в отдельном процессе.
+    Возвращает (значения полей снимков, ошибки ячеек).
+    """
+    rows = read_report_rows(source)
+    with metrics.ingest_stage_seconds.time(stage="convert"):
+        return normalize_report(rows)
+
+
+def save_report(d: date, records: list[dict], entry: ReportManifest | None = None,
+                rollups: bool = True) -> tuple[int, int]:
+    """
+    Записывает строки отчёта за дату d, связывает их с товарами справочника,
+    пополняет справочник инструментов, пересчитывает агрегаты (SnapshotRollup)
+    и, если передана запись манифеста, отмечает отчёт разобранным в той же транзакции.
+    При rollups=False агрегаты пересчитывает вызывающий, один раз на много дат.
+    Возвращает (создано, обновлено); обновлёнными считаются только строки
+    с изменившимися значениями.
+    """
+    with metrics.ingest_stage_seconds.time(stage="db_write"), transaction.atomic():
+        created, updated, unchanged = bulk_upsert_snapshots(
+            (MarketInstrumentSnapshot(date=d, **record) for record in records),
+            source_hash=entry.content_hash if entry is not None else "",
+        )
+        # Повторно опубликованный отчёт без правок ничего не пересчитывает
+        if created:
+            link_products(MarketInstrumentSnapshot.objects.filter(date=d))
+            register_instruments(records)
+        if created or updated:
+            if rollups:
+                update_rollups([d])
+            bump_data_version()
+        if entry is not None:
+            mark_parsed(entry)
+    metrics.ingest_rows.inc(created, result="created")
+    metrics.ingest_rows.inc(updated, result="updated")
+    metrics.ingest_rows.inc(unchanged, result="unchanged")
+    return created, updated
+
+
+def archive_report(d: date, records: list[dict], entry: ReportManifest | None = None, log=print):
+    """
+    Сохраняет нормализованные строки отчёта в архив (SPIMEX_ARCHIVE_DIR).
+    Ошибка архива не прерывает загрузку: отчёт уже записан в БД.
+    """
+    try:
+        archive.write_report(d, records, entry.content_hash if entry is not None else "")
+    except (archive.ArchiveDependencyError, OSError) as e:
+        log(f'{d}: отчёт не записан в архив: {e}')
+
+
+def _noop_progress(d: date, state: str):
+    pass
+
+
+def _counted(progress):
+    def wrapper(d: date, state: str):
+        metrics.ingest_dates.inc(state=state)
+        progress(d, state)
+    return wrapper
+
+
+def pending_dates(dates, manifest: dict[date, ReportManifest], recheck: bool = True, log=print,
+                  progress=_noop_progress) -> list[date]:
+    """
+    Отбрасывает известные неторговые дни, а при recheck=False — и уже
+    разобранные отчёты, не делая по ним запросов.
+    """
+    pending = []
+    for d in dates:
+        entry = manifest.get(d)
+        if entry is not None and entry.is_known_non_trading_day:
+            log(f'{entry.status}: {d}: неторговый день, пропуск')
+            progress(d, "non_trading")
+            continue
+        if entry is not None and entry.is_parsed and not recheck:
+            progress(d, "unchanged")
+            continue
+        pending.append(d)
+    return pending
+
+
+def accept_download(result: DownloadResult, manifest: dict[date, ReportManifest], log=print,
+                    progress=_noop_progress) -> ReportManifest | None:
+    """
+    Записывает итог запроса в манифест. Возвращает запись манифеста, если
+    отчёт получен и ещё не разбирался в этой версии, иначе None.
+    """
+    d = result.date
+    if result.error:
+        log(f'{result.error}: {d}')
+        progress(d, "download_error")
+        return None
+
+    entry = record_download(result, manifest.get(d))
+    manifest[d] = entry
+    if result.not_modified:
+        log(f'{result.status}: {d}: отчёт не изменился')
+        progress(d, "unchanged")
+        return None
+    if not result.ok:
+        log(f'{result.status}: {d}')
+        progress(d, "non_trading" if result.status == 404 else "download_error")
+        return None
+    if entry.is_parsed:
+        log(f'{result.status}: {d}: содержимое не изменилось, разбор пропущен')
+        progress(d, "unchanged")
+        return None
+
+    log(f'{result.status}: {d}: файл получен ({result.elapsed:.2f} c)')
+    progress(d, "downloaded")
+    return entry
+
+
+def fetch_changed_reports(dates, downloader: ReportDownloader, manifest: dict[date, ReportManifest], log=print,
+                          progress=_noop_progress):
+    """
+    Скачивает отчёты условными запросами, обновляет манифест и отдаёт
+    пары (результат загрузки, запись манифеста) только для отчётов,
+    которые ещё не разбирались в этой версии.
+    """
+    headers = {d: conditional_headers(manifest.get(d)) for d in dates}
+    for result in downloader.fetch_many(dates, headers=headers):
+        entry = accept_download(result, manifest, log=log, progress=progress)
+        if entry is not None:
+            yield result, entry
+
+
+def new_stats() -> dict[str, int]:
+    return {"reports": 0, "created": 0, "updated": 0, "errors": 0}
+
+
+def add_stats(stats: dict[str, int], created: int, updated: int, errors: list[CellError]):
+    stats["reports"] += 1
+    stats["created"] += created
+    stats["updated"] += updated
+    stats["errors"] += len(errors)
+    metrics.ingest_cell_errors.inc(len(errors))
+
+
+def ingest_reports(dates, downloader: ReportDownloader | None = None, log=print, progress=_noop_progress):
+    """
+    Загружает и разбирает отчёты за даты. Известные неторговые дни не
+    запрашиваются, неизменившиеся отчёты (304 или тот же хэш) не разбираются.
+    Возвращает счётчики разобранных отчётов и созданных/обновлённых строк.
+
+    progress(d, state) вызывается при смене состояния даты: non_trading,
+    unchanged, download_error, downloaded, format_error, done.
+    """
+    stats = new_stats()
+    dates = list(dates)
+    progress = _counted(progress)
+    manifest = load_manifest(dates)
+    pending = pending_dates(dates, manifest, log=log, progress=progress)
+
+    own_downloader = downloader is None
+    if own_downloader:
+        downloader = ReportDownloader()
+    try:
+        for result, entry in fetch_changed_reports(pending, downloader, manifest, log=log, progress=progress):
+            d = result.date
+            started = time.perf_counter()
+            try:
+                records, errors = parse_report(result.content)
+            except ReportFormatError as e:
+                log(f'{d}: {e}')
+                progress(d, "format_error")
+                continue
+            parsed = time.perf_counter()
+            created, updated = save_report(d, records, entry)
+            written = time.perf_counter()
+            archive_report(d, records, entry, log=log)
+            for error in errors:
+                log(f'{d}: {error}')
+            log(f'{d}: создано {created}, обновлено {updated}, ошибок {len(errors)} '
+                f'(скачивание {result.elapsed:.2f} c, разбор {parsed - started:.2f} c, '
+                f'запись {written - parsed:.2f} c)')
+            add_stats(stats, created, updated, errors)
+            progress(d, "done")
+    finally:
+        if own_downloader:
+            downloader.close()
+    return stats
+
+
+async def aingest_reports(dates, downloader: ReportDownloader | None = None, log=print,
+                          progress=_noop_progress, parse_executor=None):
+    """
+    Асинхронный вариант ingest_reports с тем же манифестом, прогрессом
+    и счётчиками. Для каждой даты скачивание, разбор и запись идут
+    друг за другом, а разные даты — одновременно: пока одна пишется в БД,
+    следующие скачиваются и разбираются.
+
+    Скачивание — в пуле потоков на downloader.max_workers соединений,
+    разбор — в parse_executor (по умолчанию общий пул блокирующих вызовов),
+    все обращения к БД на запись — по очереди через пул писателя.
+    Одновременно в работе не больше INGEST_ASYNC_INFLIGHT дат, поэтому
+    в памяти держится ограниченное число скачанных отчётов.
+    """
+    stats = new_stats()
+    dates = list(dates)
+    progress = _counted(progress)
+    manifest = await run_blocking(load_manifest, dates)
+    pending = await run_write(pending_dates, dates, manifest, log=log, progress=progress)
+
+    own_downloader = downloader is None
+    if own_downloader:
+        downloader = ReportDownloader()
+    loop = asyncio.get_running_loop()
+    download_executor = ThreadPoolExecutor(max_workers=downloader.max_workers, thread_name_prefix="download")
+
+    async def ingest_one(d: date):
+        result = await loop.run_in_executor(download_executor, downloader.fetch, d,
+                                            conditional_headers(manifest.get(d)))
+        entry = await run_write(accept_download, result, manifest, log=log, progress=progress)
+        if entry is None:
+            return
+        started = time.perf_counter()
+        try:
+            if parse_executor is None:
+                records, errors = await run_blocking(parse_report, result.content)
+            else:
+                records, errors = await loop.run_in_executor(parse_executor, workers.parse_report, result.content)
+        except ReportFormatError as e:
+            log(f'{d}: {e}')
+            await run_write(progress, d, "format_error")
+            return
+        parsed = time.perf_counter()
+        created, updated = await run_write(save_report, d, records, entry)
+        written = time.perf_counter()
+        await run_blocking(archive_report, d, records, entry, log=log)
+        for error in errors:
+            log(f'{d}: {error}')
+        # Разбор и запись здесь включают ожидание свободного потока пула
+        log(f'{d}: создано {created}, обновлено {updated}, ошибок {len(errors)} '
+            f'(скачивание {result.elapsed:.2f} c, разбор {parsed - started:.2f} c, '
+            f'запись {written - parsed:.2f} c)')
+        add_stats(stats, created, updated, errors)
+        await run_write(progress, d, "done")
+
+    # Постоянное число обработчиков берёт даты из общего итератора:
+    # следующая дата скачивается, только когда предыдущая записана
+    queue = iter(pending)
+
+    async def worker():
+        for d in queue:
+            await ingest_one(d)
+
+    inflight = getattr(settings, "INGEST_ASYNC_INFLIGHT", 16)
+    try:
+        async with asyncio.TaskGroup() as tasks:
+            for _ in range(min(inflight, len(pending))):
+                tasks.create_task(worker())
+    finally:
+        download_executor.shutdown(wait=False, cancel_futures=True)
+        if own_downloader:
+            downloader.close()
+    return stats
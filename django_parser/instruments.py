@@ -0,0 +1,149 @@
+"""
+Справочник инструментов для фильтра списка.
+
+Кэш списка выбора версионируется максимальным id справочника: id растёт
+только при появлении новых инструментов, поэтому кэш сбрасывается ровно
+тогда и одинаково во всех процессах (веб и ingest_worker).
+
+Поиск идёт по полнотекстовому индексу instrument_fts (SQLite FTS5),
+который триггеры поддерживают в актуальном состоянии при каждом
+пополнении справочника во время загрузки.
+"""
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Instrument
+
+
+def register_instruments(records) -> int:
+    """
+    Добавляет в справочник новые пары (код, наименование) из строк отчёта.
+    Возвращает число новых инструментов.
+    """
+    pairs = {}
+    for r in records:
+        pairs.setdefault((r["instrument_code"], r["instrument_name"]), r)
+    if not pairs:
+        return 0
+    existing = set(
+        Instrument.objects
+        .filter(code__in={code for code, _ in pairs})
+        .values_list("code", "name")
+    )
+    new = [
+        Instrument(
+            code=code,
+            name=name,
+            delivery_basis=pairs[code, name].get("delivery_basis"),
+            product=pairs[code, name].get("product") or "",
+        )
+        for code, name in sorted(pairs.keys() - existing)
+    ]
+    Instrument.objects.bulk_create(new, batch_size=500, ignore_conflicts=True)
+    return len(new)
+
+
+def catalog_version() -> int:
+    return Instrument.objects.aggregate(v=Max("pk"))["v"] or 0
+
+
+def instrument_label(code: str, name: str) -> str:
+    return f"{code} — {name}"
+
+
+def instrument_choices() -> list[tuple[str, str]]:
+    """
+    Все инструменты в виде choices, из кэша.
+    """
+    key = f"instrument_choices:{catalog_version()}"
+    choices = cache.get(key)
+    if choices is None:
+        choices = [
+            (code, instrument_label(code, name))
+            for code, name in Instrument.objects.order_by("code", "name").values_list("code", "name")
+        ]
+        cache.set(key, choices, None)
+    return choices
+
+
+def fts_available() -> bool:
+    # Таблица instrument_fts создаётся миграцией только на SQLite
+    return connection.vendor == "sqlite"
+
+
+def fts_query(text: str) -> str | None:
+    """
+    Запрос FTS5: каждое слово — префикс, все слова обязательны.
+    Слова берутся в кавычки, поэтому синтаксис FTS5 во вводе не срабатывает.
+    """
+    words = re.findall(r"\w+", text.casefold())
+    return " AND ".join(f'"{word}"*' for word in words) or None
+
+
+def matching_instruments(text: str):
+    """
+    Инструменты, подходящие под поисковую строку (наименование, код,
+    базис поставки, товар); годится как подзапрос.
+    """
+    query = fts_query(text)
+    if query is None:
+        return Instrument.objects.none()
+    if fts_available():
+        return Instrument.objects.filter(
+            pk__in=RawSQL("SELECT rowid FROM instrument_fts WHERE instrument_fts MATCH %s", [query])
+        )
+    words = re.findall(r"\w+", text)
+    condition = Q()
+    for word in words:
+        condition &= (
+            Q(code__icontains=word) | Q(name__icontains=word)
+            | Q(delivery_basis__icontains=word) | Q(product__icontains=word)
+        )
+    return Instrument.objects.filter(condition)
+
+
+def search_instruments(query: str, limit: int = 20) -> list[tuple[str, str]]:
+    """
+    Инструменты по поисковой строке. На SQLite — префиксный поиск FTS5 по
+    коду, наименованию, базису и товару с ранжированием bm25 (совпадение
+    в коде весит больше, чем в наименовании и т.д.), иначе — поиск подстроки
+    по кэшированному списку.
+    """
+    match = fts_query(query)
+    if match is None:
+        return []
+    if fts_available():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT i.code, i.name FROM {Instrument._meta.db_table} i"
+                " JOIN instrument_fts ON instrument_fts.rowid = i.id"
+                " WHERE instrument_fts MATCH %s"
+                " ORDER BY bm25(instrument_fts, 10.0, 5.0, 2.0, 1.0) LIMIT %s",
+                [match, limit],
+            )
+            return [(code, instrument_label(code, name)) for code, name in cursor.fetchall()]
+
+    query = query.strip().casefold()
+    found = []
+    for code, label in instrument_choices():
+        if query in label.casefold():
+            found.append((code, label))
+            if len(found) >= limit:
+                break
+    return found
+
+
+def selected_choices(codes) -> list[tuple[str, str]]:
+    """
+    choices только для выбранных кодов: столько строк, сколько выбрано.
+    """
+    if not codes:
+        return []
+    return [
+        (code, instrument_label(code, name))
+        for code, name in Instrument.objects.filter(code__in=list(codes)).order_by("code", "name").values_list("code", "name")
+    ]
@@ -0,0 +1,165 @@
+"""
+Фоновые задачи загрузки отчётов с очередью в БД.
+
+Веб-запрос только ставит задачу в очередь (enqueue_ingest), выполняет её
+отдельный процесс `manage.py ingest_worker` или, при
+INGEST_EMBEDDED_WORKER = True, фоновый поток веб-процесса.
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .ingest import aingest_reports, generate_dates, ingest_reports
+from .models import IngestJob
+from .workers import init_parse_worker
+
+
+def enqueue_ingest(date_from: date, date_to: date) -> tuple[IngestJob, bool]:
+    """
+    Ставит в очередь загрузку за диапазон дат. Если такая задача уже
+    в очереди или выполняется, возвращает её. Возвращает (задача, создана ли).
+    """
+    active = IngestJob.objects.filter(
+        date_from=date_from, date_to=date_to, status__in=IngestJob.ACTIVE_STATUSES
+    )
+    job = active.first()
+    if job is not None:
+        return job, False
+    try:
+        with transaction.atomic():
+            return IngestJob.objects.create(date_from=date_from, date_to=date_to), True
+    except IntegrityError:
+        # Параллельный запрос успел создать такую же задачу
+        return active.get(), False
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Возвращает в очередь задачи, выполнение которых давно не продвигалось
+    (процесс-исполнитель, вероятно, завершился аварийно).
+    """
+    stale_after = timedelta(seconds=getattr(settings, "INGEST_JOB_STALE_AFTER", 600))
+    return IngestJob.objects.filter(
+        status=IngestJob.Status.RUNNING,
+        updated_at__lt=timezone.now() - stale_after,
+    ).update(status=IngestJob.Status.QUEUED, updated_at=timezone.now())
+
+
+def claim_next_job() -> IngestJob | None:
+    """
+    Забирает самую старую задачу из очереди. Захват — условный UPDATE,
+    поэтому одну задачу не возьмут два исполнителя.
+    """
+    for job in IngestJob.objects.filter(status=IngestJob.Status.QUEUED).order_by("created_at")[:5]:
+        claimed = IngestJob.objects.filter(pk=job.pk, status=IngestJob.Status.QUEUED).update(
+            status=IngestJob.Status.RUNNING, started_at=timezone.now(), updated_at=timezone.now()
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_ingest(dates, progress, log=print):
+    """
+    Загрузка за даты обычным или асинхронным конвейером (INGEST_ASYNC_PIPELINE).
+    """
+    if not getattr(settings, "INGEST_ASYNC_PIPELINE", False):
+        return ingest_reports(dates, log=log, progress=progress)
+
+    processes = getattr(settings, "INGEST_PARSE_PROCESSES", 0)
+    if not processes:
+        return asyncio.run(aingest_reports(dates, log=log, progress=progress))
+    pool = ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_parse_worker,
+    )
+    with pool:
+        return asyncio.run(aingest_reports(dates, log=log, progress=progress, parse_executor=pool))
+
+
+def run_job(job: IngestJob, log=print):
+    dates = list(generate_dates((job.date_to - job.date_from).days, direction="future", start=job.date_from))
+    job.progress = {d.isoformat(): "pending" for d in dates}
+    job.save(update_fields=["progress", "updated_at"])
+
+    def progress(d: date, state: str):
+        job.progress[d.isoformat()] = state
+        job.save(update_fields=["progress", "updated_at"])
+
+    try:
+        job.stats = run_ingest(dates, progress, log=log)
+        job.status = IngestJob.Status.DONE
+    except Exception:
+        job.error = traceback.format_exc()
+        job.status = IngestJob.Status.FAILED
+    job.finished_at = timezone.now()
+    job.save(update_fields=["stats", "status", "error", "finished_at", "updated_at"])
+    return job
+
+
+def run_pending_jobs(log=print) -> int:
+    """
+    Выполняет задачи, пока очередь не опустеет. Возвращает число выполненных.
+    """
+    done = 0
+    requeue_stale_jobs()
+    while (job := claim_next_job()) is not None:
+        run_job(job, log=log)
+        done += 1
+    return done
+
+
+def work_forever(poll_interval: float = 5.0, log=print):
+    while True:
+        close_old_connections()
+        if not run_pending_jobs(log=log):
+            time.sleep(poll_interval)
+
+
+_embedded_worker: threading.Thread | None = None
+_embedded_lock = threading.Lock()
+
+
+def _embedded_worker_main():
+    global _embedded_worker
+    try:
+        while True:
+            run_pending_jobs()
+            # Проверка под блокировкой: задача, поставленная после выхода
+            # из цикла, либо будет найдена здесь, либо запустит новый поток
+            with _embedded_lock:
+                if not IngestJob.objects.filter(status=IngestJob.Status.QUEUED).exists():
+                    _embedded_worker = None
+                    return
+    except BaseException:
+        with _embedded_lock:
+            _embedded_worker = None
+        raise
+    finally:
+        close_old_connections()
+
+
+def ensure_embedded_worker():
+    """
+    Запускает поток-исполнитель внутри веб-процесса, если он ещё не работает.
+    Поток разбирает очередь и завершается.
+    """
+    global _embedded_worker
+    if not getattr(settings, "INGEST_EMBEDDED_WORKER", False):
+        return
+    with _embedded_lock:
+        if _embedded_worker is None:
+            _embedded_worker = threading.Thread(
+                target=_embedded_worker_main, name="ingest-worker", daemon=True
+            )
+            _embedded_worker.start()
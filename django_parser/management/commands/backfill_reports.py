@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_parser.downloader import ReportDownloader
+from django_parser.ingest import (
+    add_stats, archive_report, fetch_changed_reports, generate_dates, load_manifest,
+    new_stats, pending_dates, save_report,
+)
+from django_parser.metrics import profiled
+from django_parser.reports import ReportFormatError
+from django_parser.workers import init_parse_worker, parse_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает отчёты SPIMEX за диапазон дат: параллельное скачивание, "
+        "разбор в пуле процессов и запись в БД в одном процессе. "
+        "Уже разобранные отчёты пропускаются, поэтому прерванную загрузку "
+        "можно просто запустить повторно."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", type=date.fromisoformat, required=True,
+                            help="Первая дата, YYYY-MM-DD")
+        parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None,
+                            help="Последняя дата, YYYY-MM-DD (по умолчанию сегодня)")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                            help="Число процессов разбора")
+        parser.add_argument("--download-workers", type=int, default=None,
+                            help="Число параллельных загрузок (SPIMEX_DOWNLOAD_WORKERS)")
+        parser.add_argument("--chunk", type=int, default=64,
+                            help="Сколько дат загружать за один проход")
+        parser.add_argument("--recheck", action="store_true",
+                            help="Проверять условным запросом и уже разобранные отчёты")
+        parser.add_argument("--profile", default=None,
+                            help="Сохранить профиль cProfile основного процесса в файл")
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        date_from = options["date_from"]
+        date_to = options["date_to"] or date.today()
+        if date_from > date_to:
+            raise CommandError("--from должна быть не позже --to")
+
+        dates = list(generate_dates((date_to - date_from).days, direction="future", start=date_from))
+        manifest = load_manifest(dates)
+        pending = pending_dates(dates, manifest, recheck=options["recheck"], log=self.log_verbose)
+        self.stdout.write(f"Дат в диапазоне: {len(dates)}, к загрузке: {len(pending)}")
+
+        stats = new_stats()
+        started = time.monotonic()
+        done = 0
+        pool = ProcessPoolExecutor(
+            max_workers=options["workers"],
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_parse_worker,
+        )
+        try:
+            with profiled(options["profile"]), pool, ReportDownloader(max_workers=options["download_workers"]) as downloader:
+                for i in range(0, len(pending), options["chunk"]):
+                    chunk = pending[i:i + options["chunk"]]
+                    futures = {
+                        pool.submit(parse_report, result.content): (result.date, entry)
+                        for result, entry in fetch_changed_reports(chunk, downloader, manifest,
+                                                                   log=self.log_verbose)
+                    }
+                    # Запись идёт только из этого процесса; разбор уже идёт параллельно
+                    for future in as_completed(futures):
+                        d, entry = futures[future]
+                        try:
+                            records, errors = future.result()
+                        except ReportFormatError as e:
+                            self.stderr.write(f"{d}: {e}")
+                            continue
+                        created, updated = save_report(d, records, entry)
+                        archive_report(d, records, entry, log=self.stderr.write)
+                        add_stats(stats, created, updated, errors)
+                        for error in errors:
+                            self.log_verbose(f"{d}: {error}")
+                        self.stdout.write(
+                            f"{d}: создано {created}, обновлено {updated}, ошибок {len(errors)}"
+                        )
+                    done += len(chunk)
+                    self.progress(done, len(pending), stats, started)
+        except KeyboardInterrupt:
+            pool.shutdown(cancel_futures=True)
+            raise CommandError("Прервано; уже записанные отчёты при повторном запуске будут пропущены")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: отчётов {stats['reports']}, создано {stats['created']}, "
+            f"обновлено {stats['updated']}, ошибок ячеек {stats['errors']}"
+        ))
+
+    def log_verbose(self, message: str):
+        if self.verbosity > 1:
+            self.stdout.write(message)
+
+    def progress(self, done: int, total: int, stats: dict[str, int], started: float):
+        elapsed = time.monotonic() - started
+        rows = stats["created"] + stats["updated"]
+        self.stdout.write(
+            f"[{done}/{total}] {elapsed:.1f} c, строк {rows} ({rows / elapsed if elapsed else 0:.0f}/c)"
+        )
@@ -0,0 +1,256 @@
+import functools
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+
+from django_parser.downloader import ReportDownloader
+from django_parser.ingest import ingest_reports, parse_report, save_report, upsert_snapshot
+from django_parser.models import MarketInstrumentSnapshot, ReportManifest
+from django_parser.reports import find_row_index_by_marker_xls, read_report_rows
+from django_parser.synthetic import instrument, write_reports
+from django_parser.views import SnapshotListView
+
+
+# Запросы страницы списка: (название, параметры GET)
+LIST_CASES = [
+    ("default", {}),
+    ("sort_market_price", {"sort": "РынЦена", "dir": "max"}),
+    ("sort_code_asc", {"sort": "КодИнструмента", "dir": "min"}),
+    ("last_page", {"cursor": "last"}),
+    ("date_range_sort_avg", {"date_from": "DATE_FROM", "sort": "СреднЦена"}),
+    ("instruments", {"instrument_codes": "CODES"}),
+    ("search", {"q": "АИ-95"}),
+]
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _seconds(started: float) -> float:
+    return round(time.perf_counter() - started, 4)
+
+
+def _latency(samples: list[float]) -> dict[str, float]:
+    ms = sorted(x * 1000 for x in samples)
+    q = statistics.quantiles(ms, n=20, method="inclusive") if len(ms) > 1 else ms * 19
+    return {"p50_ms": round(statistics.median(ms), 2), "p95_ms": round(q[18], 2), "max_ms": round(ms[-1], 2)}
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк загрузки и списка снимков на синтетических отчётах: скачивание "
+        "с локального HTTP-сервера, поиск маркера, разбор, upsert_snapshot, "
+        "save_report, загрузка целиком и задержка SnapshotListView при разном "
+        "числе строк. Работает на временной базе данных; результаты в JSON (--output). "
+        "Нужен пакет xlwt."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reports", type=int, default=5, help="Число синтетических отчётов")
+        parser.add_argument("--rows", type=int, default=3000, help="Инструментов в отчёте")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--upsert-rows", type=int, default=300,
+                            help="Сколько строк записывать построчно через upsert_snapshot")
+        parser.add_argument("--list-sizes", default="10000,1000000,10000000",
+                            help="Размеры таблицы снимков для замера списка, через запятую")
+        parser.add_argument("--list-repeats", type=int, default=10, help="Повторов каждого запроса списка")
+        parser.add_argument("--output", default=None, help="Файл для результатов в JSON")
+
+    def handle(self, *args, **options):
+        try:
+            import xlwt  # noqa: F401
+        except ImportError as e:
+            raise CommandError("Для генерации синтетических отчётов нужен пакет xlwt") from e
+        try:
+            list_sizes = sorted(int(s) for s in options["list_sizes"].split(",") if s.strip())
+        except ValueError as e:
+            raise CommandError("--list-sizes: целые числа через запятую") from e
+
+        self.options = options
+        self.results = {"meta": self.meta(), "params": {
+            name: options[name] for name in ("reports", "rows", "seed", "upsert_rows", "list_repeats")
+        } | {"list_sizes": list_sizes}, "stages": {}, "list_view": []}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            reports_dir = os.path.join(tmp, "reports")
+            dates = [date(2026, 1, 5) + timedelta(days=i) for i in range(options["reports"])]
+            started = time.perf_counter()
+            paths = write_reports(reports_dir, dates, options["rows"], options["seed"])
+            self.stdout.write(f"Сгенерировано отчётов: {len(paths)} за {_seconds(started)} с")
+
+            server = ThreadingHTTPServer(
+                ("127.0.0.1", 0), functools.partial(_QuietHandler, directory=reports_dir)
+            )
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+            connection.settings_dict.setdefault("TEST", {})["NAME"] = os.path.join(tmp, "bench.sqlite3")
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                with override_settings(SPIMEX_ARCHIVE_DIR=None, SNAPSHOT_TIER_DIR=None,
+                                      SNAPSHOT_PAGE_CACHE_SECONDS=0):
+                    cache.clear()
+                    self.bench_stages(dates, paths, base_url)
+                    for size in list_sizes:
+                        self.bench_list(size, dates)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                server.shutdown()
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(self.results, f, ensure_ascii=False, indent=2, default=str)
+            self.stdout.write(f"Результаты записаны в {options['output']}")
+
+    def meta(self) -> dict:
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        }
+
+    def record(self, stage: str, seconds: float, **values):
+        result = {"seconds": seconds, **values}
+        for unit in ("rows", "reports", "bytes"):
+            if unit in values and seconds:
+                result[f"{unit}_per_second"] = round(values[unit] / seconds, 1)
+        self.results["stages"][stage] = result
+        self.stdout.write(f"{stage:<22}" + ", ".join(f"{k}={v}" for k, v in result.items()))
+
+    def bench_stages(self, dates: list[date], paths: list[str], base_url: str):
+        rows = self.options["rows"]
+
+        started = time.perf_counter()
+        with ReportDownloader(base_url=base_url, download_dir="") as downloader:
+            results = list(downloader.fetch_many(dates))
+        if not all(r.ok for r in results):
+            raise CommandError(f"Локальный сервер отдал не все отчёты: {[r.status for r in results]}")
+        self.record("download", _seconds(started), reports=len(results),
+                    bytes=sum(len(r.content) for r in results))
+
+        started = time.perf_counter()
+        for path in paths:
+            find_row_index_by_marker_xls(path)
+        self.record("find_marker", _seconds(started), reports=len(paths))
+
+        started = time.perf_counter()
+        parsed = [parse_report(r.content) for r in results]
+        self.record("convert", _seconds(started), reports=len(parsed), rows=sum(len(p[0]) for p in parsed),
+                    cell_errors=sum(len(p[1]) for p in parsed))
+
+        started = time.perf_counter()
+        with ReportDownloader(base_url=base_url, download_dir="") as downloader:
+            stats = ingest_reports(dates, downloader=downloader, log=lambda message: None)
+        self.record("end_to_end", _seconds(started), reports=stats["reports"],
+                    rows=stats["created"] + stats["updated"])
+
+        started = time.perf_counter()
+        for r, (records, _) in zip(results, parsed):
+            save_report(r.date, records)
+        self.record("save_report_update", _seconds(started), reports=len(parsed), rows=len(parsed) * rows)
+
+        sample = read_report_rows(paths[0])[:self.options["upsert_rows"]]
+        started = time.perf_counter()
+        for row in sample:
+            upsert_snapshot(row, dates[0])
+        self.record("upsert_snapshot", _seconds(started), rows=len(sample))
+
+        ReportManifest.objects.all().delete()
+
+    def fill_snapshots(self, size: int, first_date: date):
+        """
+        Добавляет синтетические снимки до size строк прямым INSERT пачками:
+        отчёты по self.options["rows"] инструментов за даты до first_date.
+        """
+        table = MarketInstrumentSnapshot._meta.db_table
+        fields = [f for f in MarketInstrumentSnapshot._meta.concrete_fields if not f.primary_key]
+        columns = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+        sql = f"INSERT INTO {table} ({columns}) VALUES ({', '.join(['%s'] * len(fields))})"
+
+        rows_per_date = self.options["rows"]
+        current = MarketInstrumentSnapshot.objects.count()
+        d = MarketInstrumentSnapshot.objects.order_by("date").values_list("date", flat=True).first() or first_date
+        rnd = random.Random(self.options["seed"])
+        while current < size:
+            d -= timedelta(days=1)
+            batch = []
+            for i in range(min(rows_per_date, size - current)):
+                code, name, basis = instrument(i)
+                price = round(40000 + (i % 500) * 100 + rnd.uniform(-1500, 1500), 2)
+                volume = rnd.randrange(60, 6000, 60)
+                values = {
+                    "instrument_code": code, "instrument_name": name, "delivery_basis": basis,
+                    "contracts_volume_ei": volume, "contracts_volume_rub": round(volume * price, 2),
+                    "market_change_rub": round(rnd.uniform(-900, 900), 2),
+                    "market_change_pct": round(rnd.uniform(-2, 2), 2),
+                    "min_price": price - 300, "avg_price": price, "max_price": price + 300,
+                    "market_price": price, "best_offer": price + 500, "best_bid": price - 500,
+                    "contracts_count": rnd.randint(1, 40), "date": d, "product": name.split(",")[0],
+                }
+                batch.append([f.get_db_prep_save(values.get(f.name), connection) for f in fields])
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+            current += len(batch)
+
+    def bench_list(self, size: int, dates: list[date]):
+        started = time.perf_counter()
+        self.fill_snapshots(size, dates[0])
+        rows = MarketInstrumentSnapshot.objects.count()
+        self.stdout.write(f"Снимков в таблице: {rows} (заполнение {_seconds(started)} с)")
+
+        last = max(dates)
+        codes = [instrument(i)[0] for i in (0, 7)]
+        view = SnapshotListView.as_view()
+        factory = RequestFactory()
+        for name, params in LIST_CASES:
+            params = {
+                key: codes if value == "CODES" else
+                (last - timedelta(days=30)).isoformat() if value == "DATE_FROM" else value
+                for key, value in params.items()
+            }
+            cold, warm = [], []
+            for _ in range(self.options["list_repeats"]):
+                # Холодный запрос — со счётчиком COUNT(*), тёплый — со счётчиком из кэша
+                cache.clear()
+                for samples in (cold, warm):
+                    started = time.perf_counter()
+                    response = view(factory.get("/", params))
+                    response.render()
+                    samples.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        raise CommandError(f"{name}: HTTP {response.status_code}")
+            result = {"rows": rows, "case": name, "cold": _latency(cold), "warm": _latency(warm)}
+            self.results["list_view"].append(result)
+            self.stdout.write(
+                f"  {name:<22}холодный p50 {result['cold']['p50_ms']} мс, p95 {result['cold']['p95_ms']} мс; "
+                f"тёплый p50 {result['warm']['p50_ms']} мс, p95 {result['warm']['p95_ms']} мс"
+            )
@@ -0,0 +1,218 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+
+from django_parser.models import MarketInstrumentSnapshot
+from django_parser.sqlite import pragma_statements
+
+
+# Настройки SQLite по умолчанию (rollback journal) для сравнения
+DEFAULT_PROFILE = {"journal_mode": "DELETE"}
+
+# Прагмы, которые хранятся в файле базы: задаются один раз на копии до
+# запуска потоков. Смена journal_mode из нескольких соединений сразу
+# конкурирует за блокировку и падает с "database is locked"
+FILE_PRAGMAS = ("journal_mode",)
+
+
+def split_pragmas(pragmas: dict) -> tuple[dict, dict]:
+    """
+    (прагмы файла базы, прагмы соединения).
+    """
+    file_pragmas = {k: v for k, v in pragmas.items() if k in FILE_PRAGMAS}
+    return file_pragmas, {k: v for k, v in pragmas.items() if k not in FILE_PRAGMAS}
+
+
+def reader_queries() -> list[tuple[str, list]]:
+    """
+    SQL страниц списка: сортировка по умолчанию и диапазон дат с сортировкой по цене.
+    """
+    last = MarketInstrumentSnapshot.objects.aggregate(d=Max("date"))["d"] or date.today()
+    querysets = [
+        MarketInstrumentSnapshot.objects.order_by("date", "instrument_code", "pk")[:51],
+        MarketInstrumentSnapshot.objects.filter(date__gte=last.replace(day=1))
+        .order_by("-market_price", "-instrument_code", "-pk")[:51],
+        MarketInstrumentSnapshot.objects.filter(date__gte=last.replace(day=1)),
+    ]
+    queries = []
+    for qs in querysets:
+        sql, params = qs.query.sql_with_params()
+        if not qs.query.is_sliced and not qs.query.order_by:
+            sql = f"SELECT COUNT(*) FROM ({sql})"
+        params = [str(p) if isinstance(p, (date, Decimal)) else p for p in params]
+        queries.append((sql.replace("%s", "?"), params))
+    return queries
+
+
+def is_locked(e: sqlite3.OperationalError) -> bool:
+    return "locked" in str(e) or "busy" in str(e)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает задержку чтения страниц списка во время длинных транзакций "
+        "записи для настроек SQLite по умолчанию и профиля SQLITE_PRAGMAS. "
+        "Писатель держит транзакцию BEGIN EXCLUSIVE --hold секунд: в режиме "
+        "rollback journal читатели ждут её конца, в WAL читают прежнюю версию. "
+        "Работает на копии базы данных, исходная база не изменяется."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=10.0, help="Длительность прогона каждого профиля")
+        parser.add_argument("--readers", type=int, default=4, help="Число читающих потоков")
+        parser.add_argument("--hold", type=float, default=0.5,
+                            help="Сколько секунд писатель держит транзакцию после записи")
+        parser.add_argument("--dates", type=int, default=3,
+                            help="Сколько последних дат перезаписывается в одной транзакции")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Бенчмарк рассчитан на SQLite")
+        source = str(connection.settings_dict["NAME"])
+        table = MarketInstrumentSnapshot._meta.db_table
+        dates = [
+            str(d) for d in MarketInstrumentSnapshot.objects.values_list("date", flat=True)
+            .distinct().order_by("-date")[:options["dates"]]
+        ]
+        if not dates:
+            raise CommandError("Нет данных для бенчмарка: загрузите отчёты")
+        queries = reader_queries()
+        timeout = connection.settings_dict["OPTIONS"].get("timeout", 5)
+
+        profiles = {
+            "default": (DEFAULT_PROFILE, 5),
+            "tuned": (getattr(settings, "SQLITE_PRAGMAS", {}), timeout),
+        }
+        self.stdout.write(
+            f"Читателей: {options['readers']}, транзакция записи: {len(dates)} дат + {options['hold']} с, "
+            f"прогон {options['seconds']} с"
+        )
+        self.stdout.write(f"{'профиль':<10}{'чтений':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}"
+                          f"{'max, мс':>10}{'locked':>8}{'записей':>9}")
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, (pragmas, busy_timeout) in profiles.items():
+                path = os.path.join(tmp, f"{name}.sqlite3")
+                file_pragmas, pragmas = split_pragmas(pragmas)
+                self.copy_database(source, path, file_pragmas)
+                result = self.run_profile(path, pragmas, busy_timeout, table, dates, queries, options)
+                self.stdout.write(self.format_result(name, *result))
+
+    def copy_database(self, source: str, path: str, file_pragmas: dict):
+        """
+        Копия базы с прагмами файла. Копия наследует режим журнала исходной
+        базы, поэтому journal_mode задаётся явно для каждого профиля.
+        """
+        src, dst = sqlite3.connect(source), sqlite3.connect(path, isolation_level=None)
+        try:
+            src.backup(dst)
+            for statement in pragma_statements(file_pragmas):
+                dst.execute(statement)
+        finally:
+            src.close()
+            dst.close()
+
+    def connect(self, path: str, pragmas: dict, busy_timeout: float) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        for statement in pragma_statements(pragmas):
+            conn.execute(statement)
+        return conn
+
+    def run_profile(self, path, pragmas, busy_timeout, table, dates, queries, options):
+        stop = threading.Event()
+        latencies, locked, writes, errors = [], [0], [0], []
+        lock = threading.Lock()
+
+        def guarded(target, *args):
+            # Ошибка в потоке останавливает прогон и выводится командой,
+            # а не теряется с пустой статистикой
+            def run():
+                try:
+                    target(*args)
+                except Exception as e:
+                    with lock:
+                        errors.append(f"{threading.current_thread().name}: {e!r}")
+                    stop.set()
+            return run
+
+        def writer():
+            conn = self.connect(path, pragmas, busy_timeout)
+            placeholders = ", ".join("?" * len(dates))
+            try:
+                while not stop.is_set():
+                    try:
+                        # EXCLUSIVE — блокировка, которую длинная запись получает при
+                        # сбросе кэша на диск и фиксации; читатели снимают задержку,
+                        # пока транзакция открыта
+                        conn.execute("BEGIN EXCLUSIVE")
+                        # Как при загрузке: меняются строки и индексы нескольких дат
+                        conn.execute(
+                            f"UPDATE {table} SET contracts_count = contracts_count + 1, "
+                            f"market_price = -market_price WHERE date IN ({placeholders})",
+                            dates,
+                        )
+                        stop.wait(options["hold"])
+                        conn.execute("COMMIT")
+                        writes[0] += 1
+                    except sqlite3.OperationalError as e:
+                        if not is_locked(e):
+                            raise
+                        if conn.in_transaction:
+                            conn.execute("ROLLBACK")
+                    time.sleep(0.05)
+            finally:
+                conn.close()
+
+        def reader(offset: int):
+            conn = self.connect(path, pragmas, busy_timeout)
+            i = offset
+            try:
+                while not stop.is_set():
+                    sql, params = queries[i % len(queries)]
+                    i += 1
+                    started = time.perf_counter()
+                    try:
+                        conn.execute(sql, params).fetchall()
+                    except sqlite3.OperationalError as e:
+                        if not is_locked(e):
+                            raise
+                        with lock:
+                            locked[0] += 1
+                        continue
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+            finally:
+                conn.close()
+
+        threads = [threading.Thread(target=guarded(writer), name="writer")]
+        threads += [threading.Thread(target=guarded(reader, n), name=f"reader-{n}")
+                    for n in range(options["readers"])]
+        for t in threads:
+            t.start()
+        stop.wait(options["seconds"])
+        stop.set()
+        for t in threads:
+            t.join()
+        if errors:
+            raise CommandError("Прогон прерван ошибкой в потоке: " + "; ".join(errors))
+        return latencies, locked[0], writes[0]
+
+    @staticmethod
+    def format_result(name: str, latencies: list[float], locked: int, writes: int) -> str:
+        if latencies:
+            ms = sorted(x * 1000 for x in latencies)
+            q = statistics.quantiles(ms, n=100) if len(ms) > 1 else ms * 99
+            p50, p95, p99, worst = q[49], q[94], q[98], ms[-1]
+        else:
+            p50 = p95 = p99 = worst = float("nan")
+        return (f"{name:<10}{len(latencies):>8}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}"
+                f"{worst:>10.1f}{locked:>8}{writes:>9}")
@@ -0,0 +1,107 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+
+from django_parser.models import Instrument, MarketInstrumentSnapshot, Products
+from django_parser.pagination import KeysetPaginator
+from django_parser.views import SnapshotListView
+
+
+# Типичные запросы списка: параметры строки запроса SnapshotListView.
+# CODES и PRODUCT подставляются из данных: форма принимает только
+# существующие значения
+CODES, PRODUCT = object(), object()
+
+CASES = [
+    {},
+    {"date_from": "2026-01-01", "date_to": "2026-01-31"},
+    {"date_from": "2026-01-01", "date_to": "2026-01-31", "sort": "РынЦена", "dir": "max"},
+    {"date_from": "2026-01-01", "date_to": "2026-01-31", "sort": "РынЦена", "dir": "min"},
+    {"instrument_codes": CODES, "sort": "Дата", "dir": "max"},
+    {"instrument_codes": CODES, "sort": "СреднЦена", "dir": "max"},
+    {"instrument_codes": CODES, "date_from": "2026-01-01", "date_to": "2026-01-31"},
+    {"price_from": "1000", "price_to": "50000", "sort": "РынЦена", "dir": "max"},
+    {"product": PRODUCT, "sort": "ОбъемДоговоровРуб", "dir": "max"},
+    *(
+        {"sort": label, "dir": direction}
+        for label in (
+            "КодИнструмента", "НаименованиеИнструмента", "БазисПоставки", "ОбъемДоговоровЕИ",
+            "ОбъемДоговоровРуб", "ИзмРынРуб", "ИзмРынПроц", "МинЦена", "СреднЦена", "МаксЦена",
+            "РынЦена", "КоличествоДоговоров",
+        )
+        for direction in ("max", "min")
+    ),
+]
+
+
+def sample_values() -> dict:
+    codes = list(Instrument.objects.order_by("code").values_list("code", flat=True).distinct()[:3])
+    product = Products.objects.values_list("name", flat=True).first()
+    return {CODES: codes, PRODUCT: product}
+
+
+def plan_problems(plan: str, table: str) -> list[str]:
+    """
+    Ищет в плане SQLite полный просмотр таблицы и сортировку всей таблицы.
+    Сортировка после SEARCH (диапазона индекса) допустима. Таблица может
+    быть с именем схемы: main. и tier_ГГГГ. в ветках snapshot_tiered.
+    """
+    problems = []
+    table = rf"(?:\w+\.)?{table}"
+    full_scan = re.search(rf"\bSCAN {table}\b(?! USING)", plan)
+    if full_scan:
+        problems.append("полный просмотр таблицы")
+    if "USE TEMP B-TREE FOR" in plan and not re.search(rf"\bSEARCH {table}\b", plan):
+        problems.append("сортировка всей таблицы")
+    return problems
+
+
+class Command(BaseCommand):
+    help = (
+        "Выводит планы запросов списка снимков (EXPLAIN QUERY PLAN) для типичных "
+        "фильтров и сортировок и завершается с ошибкой, если запрос читает или "
+        "сортирует всю таблицу."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--analyze", action="store_true",
+                            help="Предварительно выполнить ANALYZE для статистики планировщика")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Проверка планов рассчитана на SQLite")
+        if options["analyze"]:
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        table = MarketInstrumentSnapshot._meta.db_table
+        factory = RequestFactory()
+        samples = sample_values()
+        failed = 0
+        for case in CASES:
+            params = {key: samples.get(value, value) for key, value in case.items()}
+            if not all(params.values()):
+                self.stdout.write(f"{case} — пропущено: нет данных для подстановки")
+                continue
+            view = SnapshotListView()
+            view.setup(factory.get("/", params))
+            paginator = KeysetPaginator(view.get_queryset(), view.paginate_by, view.ordering_fields)
+
+            queries = {"первая страница": paginator.page_queryset(None)[1]}
+            first = paginator.page(None)
+            if first.next_cursor:
+                queries["следующая страница"] = paginator.page_queryset(first.next_cursor)[1]
+
+            for title, qs in queries.items():
+                plan = qs.explain()
+                problems = plan_problems(plan, table)
+                failed += bool(problems)
+                status = self.style.ERROR("; ".join(problems)) if problems else self.style.SUCCESS("OK")
+                self.stdout.write(f"{params or 'без фильтров'} — {title}: {status}")
+                if problems or options["verbosity"] > 1:
+                    self.stdout.write(plan)
+
+        if failed:
+            raise CommandError(f"Запросов с неэффективным планом: {failed}")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from django_parser.jobs import run_pending_jobs, work_forever
+from django_parser.metrics import profiled
+
+
+class Command(BaseCommand):
+    help = "Выполняет фоновые задачи загрузки отчётов из очереди в БД."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="Выполнить задачи, стоящие в очереди, и завершиться")
+        parser.add_argument("--poll-interval", type=float, default=5.0,
+                            help="Пауза между проверками пустой очереди, секунды")
+        parser.add_argument("--profile", default=None,
+                            help="Сохранить профиль cProfile в файл (обычно вместе с --once)")
+
+    def handle(self, *args, **options):
+        log = self.stdout.write if options["verbosity"] > 1 else (lambda message: None)
+        with profiled(options["profile"]):
+            if options["once"]:
+                done = run_pending_jobs(log=log)
+                self.stdout.write(f"Выполнено задач: {done}")
+                return
+            self.stdout.write("Ожидание задач загрузки...")
+            work_forever(options["poll_interval"], log=log)
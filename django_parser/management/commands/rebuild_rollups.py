@@ -0,0 +1,45 @@
+import time
+from datetime import date
+from itertools import groupby
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from django_parser.models import MarketInstrumentSnapshot
+from django_parser.rollups import update_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает агрегаты SnapshotRollup по уже загруженным снимкам, "
+        "помесячно, каждый месяц в своей транзакции. Новые отчёты "
+        "обновляют агрегаты при загрузке, команда нужна для существующих данных."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None,
+                            help="Первая дата, YYYY-MM-DD")
+        parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None,
+                            help="Последняя дата, YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        date_from, date_to = options["date_from"], options["date_to"]
+        if date_from and date_to and date_from > date_to:
+            raise CommandError("--from должна быть не позже --to")
+
+        dates = MarketInstrumentSnapshot.objects.values_list("date", flat=True).distinct().order_by("date")
+        if date_from:
+            dates = dates.filter(date__gte=date_from)
+        if date_to:
+            dates = dates.filter(date__lte=date_to)
+
+        started = time.monotonic()
+        total = 0
+        for month, month_dates in groupby(dates, key=lambda d: (d.year, d.month)):
+            with transaction.atomic():
+                total += update_rollups(month_dates)
+            self.stdout.write(f"{month[0]}-{month[1]:02d}: строк агрегатов всего {total}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: {total} строк агрегатов за {time.monotonic() - started:.1f} с"
+        ))
@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from itertools import groupby
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from django_parser.archive import ArchiveDependencyError, archive_dir, archived_reports, read_report
+from django_parser.ingest import add_stats, new_stats, save_report
+from django_parser.rollups import update_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Перезаписывает снимки из архива нормализованных отчётов "
+        "(SPIMEX_ARCHIVE_DIR) без скачивания и разбора XLS: связи с товарами, "
+        "справочник инструментов и агрегаты пересчитываются как при загрузке, "
+        "агрегаты — один раз на месяц. Следующий файл читается, пока пишется текущий."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None,
+                            help="Первая дата, YYYY-MM-DD")
+        parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None,
+                            help="Последняя дата, YYYY-MM-DD")
+        parser.add_argument("--archive-dir", default=None,
+                            help="Каталог архива (по умолчанию SPIMEX_ARCHIVE_DIR)")
+
+    def handle(self, *args, **options):
+        date_from, date_to = options["date_from"], options["date_to"]
+        if date_from and date_to and date_from > date_to:
+            raise CommandError("--from должна быть не позже --to")
+        root = options["archive_dir"] or archive_dir()
+        if not root:
+            raise CommandError("Архив не настроен: задайте SPIMEX_ARCHIVE_DIR или --archive-dir")
+
+        reports = archived_reports(date_from, date_to, root=root)
+        self.stdout.write(f"Отчётов в архиве: {len(reports)}")
+        if not reports:
+            return
+
+        stats = new_stats()
+        started = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=1) as reader:
+                upcoming = reader.submit(read_report, reports[0][1])
+                for i, (d, _) in enumerate(reports):
+                    records = upcoming.result()
+                    if i + 1 < len(reports):
+                        upcoming = reader.submit(read_report, reports[i + 1][1])
+                    created, updated = save_report(d, records, rollups=False)
+                    add_stats(stats, created, updated, [])
+                    if options["verbosity"] > 1:
+                        self.stdout.write(f"{d}: создано {created}, обновлено {updated}")
+        except ArchiveDependencyError as e:
+            raise CommandError(str(e)) from e
+        finally:
+            # Агрегаты и для частично выполненной перезаписи
+            for _, month_reports in groupby(reports[:stats["reports"]], key=lambda r: (r[0].year, r[0].month)):
+                with transaction.atomic():
+                    update_rollups(d for d, _ in month_reports)
+
+        elapsed = time.monotonic() - started
+        rows = stats["created"] + stats["updated"]
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: отчётов {stats['reports']}, создано {stats['created']}, "
+            f"обновлено {stats['updated']} за {elapsed:.1f} с ({rows / elapsed if elapsed else 0:.0f} строк/с)"
+        ))
@@ -0,0 +1,62 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from django_parser.tiers import (
+    TierError, check_tier_limit, default_horizon, move_year, tier_dir, years_to_move,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит снимки старше горизонта (SNAPSHOT_HOT_DAYS) из основной базы "
+        "в годовые архивы SQLite (SNAPSHOT_TIER_DIR/snapshots_ГГГГ.sqlite3). "
+        "Список, выгрузка и ряды читают архивы, когда диапазон дат заходит в них."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", type=date.fromisoformat, default=None,
+                            help="Переносить снимки раньше этой даты, YYYY-MM-DD "
+                                 "(по умолчанию сегодня минус SNAPSHOT_HOT_DAYS)")
+        parser.add_argument("--dry-run", action="store_true", help="Только показать, сколько строк по годам")
+        parser.add_argument("--vacuum", action="store_true",
+                            help="После переноса сжать основную базу (VACUUM, блокирует запись)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Годовые архивы поддерживаются только для SQLite")
+        root = tier_dir()
+        if not root:
+            raise CommandError("Архивы не настроены: задайте SNAPSHOT_TIER_DIR")
+
+        before = options["before"] or default_horizon()
+        years = years_to_move(before)
+        self.stdout.write(f"Снимков раньше {before}: {sum(years.values())}")
+        for year, rows in years.items():
+            self.stdout.write(f"  {year}: {rows}")
+        try:
+            check_tier_limit(years, root)
+        except TierError as e:
+            raise CommandError(str(e)) from e
+        if options["dry_run"] or not years:
+            return
+
+        started = time.monotonic()
+        moved = 0
+        for year in years:
+            try:
+                rows = move_year(year, before, root)
+            except TierError as e:
+                raise CommandError(str(e)) from e
+            moved += rows
+            self.stdout.write(f"{year}: перенесено {rows}")
+
+        if options["vacuum"]:
+            with connection.cursor() as cursor:
+                cursor.execute("VACUUM")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: перенесено {moved} снимков за {time.monotonic() - started:.1f} с"
+        ))
@@ -0,0 +1,110 @@
+"""
+Матрица инструмент × дата по одному показателю.
+
+Строки выбираются одним values_list по индексу (instrument_code, date),
+показатель приводится к float в SQL (значения FixedPointField затем делятся
+на масштаб поля), сводная таблица, изменение к предыдущей дате и скользящее
+среднее считаются в pandas по колонкам целиком.
+"""
+import numpy as np
+import pandas as pd
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+
+# Показатель -> агрегирование, если у кода за дату несколько строк
+# (один код с разными наименованиями)
+MATRIX_METRICS = {
+    "market_price": "mean",
+    "avg_price": "mean",
+    "min_price": "min",
+    "max_price": "max",
+    "best_offer": "min",
+    "best_bid": "max",
+    "market_change_pct": "mean",
+    "contracts_volume_ei": "sum",
+    "contracts_volume_rub": "sum",
+    "contracts_count": "sum",
+}
+CHANGE_MODES = ("abs", "pct")
+
+
+class MatrixTooLarge(Exception):
+    """В выборке больше снимков, чем допускает MATRIX_MAX_ROWS."""
+
+
+def load_frame(queryset, metric: str, limit: int) -> pd.DataFrame:
+    rows = list(
+        queryset.order_by("instrument_code", "date")
+        .values_list("instrument_code", "date", Cast(metric, FloatField()))[:limit + 1]
+    )
+    if len(rows) > limit:
+        raise MatrixTooLarge(f"В выборке больше {limit} строк, сузьте фильтр по датам или инструментам")
+    frame = pd.DataFrame.from_records(rows, columns=["instrument_code", "date", "value"])
+    # Поля с фиксированной точкой приводятся к float в единицах хранения
+    scale = getattr(queryset.model._meta.get_field(metric), "scale", 1)
+    if scale != 1:
+        frame["value"] /= scale
+    return frame
+
+
+def pivot(frame: pd.DataFrame, metric: str) -> pd.DataFrame:
+    """
+    Инструменты в строках, даты (по возрастанию) в колонках, NaN — нет данных.
+    """
+    if frame.empty:
+        return pd.DataFrame(dtype=float)
+    grouped = frame.groupby(["instrument_code", "date"])["value"]
+    how = MATRIX_METRICS[metric]
+    # Сумма только из NULL — NULL, а не 0
+    values = grouped.sum(min_count=1) if how == "sum" else grouped.agg(how)
+    return (
+        values
+        .unstack("date")
+        .sort_index()
+        .sort_index(axis=1)
+        .astype(float)
+    )
+
+
+def change(matrix: pd.DataFrame, mode: str) -> pd.DataFrame:
+    """
+    Изменение к предыдущему значению инструмента (пропуски между торговыми
+    днями не обнуляют изменение): abs — разница, pct — в процентах.
+    """
+    previous = matrix.ffill(axis=1).shift(1, axis=1)
+    if mode == "pct":
+        return (matrix - previous) / previous.abs().replace(0, np.nan) * 100
+    return matrix - previous
+
+
+def rolling_mean(matrix: pd.DataFrame, window: int) -> pd.DataFrame:
+    """
+    Скользящее среднее по window последним датам матрицы, пропуски не учитываются.
+    """
+    return matrix.T.rolling(window, min_periods=1).mean().T
+
+
+def _cells(matrix: pd.DataFrame) -> list[list]:
+    values = matrix.to_numpy(dtype=float).round(6)
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def build_matrix(queryset, metric: str, change_mode: str | None = None, window: int | None = None,
+                 limit: int = 200_000) -> dict:
+    """
+    Колоночный JSON матрицы: instruments, dates, values[инструмент][дата]
+    и, по запросу, change и rolling той же формы.
+    """
+    matrix = pivot(load_frame(queryset, metric, limit), metric)
+    result = {
+        "metric": metric,
+        "instruments": matrix.index.tolist(),
+        "dates": [d.isoformat() for d in matrix.columns],
+        "values": _cells(matrix),
+    }
+    if change_mode:
+        result["change"] = _cells(change(matrix, change_mode))
+    if window:
+        result["rolling"] = _cells(rolling_mean(matrix, window))
+    return result
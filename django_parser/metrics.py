@@ -0,0 +1,188 @@
+"""
+Метрики загрузки отчётов и страницы списка в текстовом формате Prometheus.
+
+Счётчики и гистограммы хранятся в памяти процесса: /metrics веб-процесса
+показывает его запросы и загрузки встроенного исполнителя
+(INGEST_EMBEDDED_WORKER); у отдельного `manage.py ingest_worker` свои
+значения. Для разового разбора узких мест есть профилирование
+(profiled, `--profile` у команд загрузки).
+"""
+import cProfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+# Границы корзин гистограмм длительности, секунды
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUERIES_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _label_key(labelnames: tuple[str, ...], labels: dict) -> tuple[str, ...]:
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Ожидались метки {labelnames}, получены {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, values, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values: dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = SECONDS_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = (*buckets, float("inf"))
+        # метки -> [счётчики корзин, сумма]
+        self.values: dict[tuple, list] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            counts, total = self.values.get(key) or ([0] * len(self.buckets), 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.values[key] = [counts, total + value]
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self.lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self.values.items())
+        for key, (counts, total) in items:
+            for bound, count in zip(self.buckets, counts):
+                le = f'le="{_format_number(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_number(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {counts[-1]}"
+
+
+REGISTRY: list[Counter | Histogram] = []
+
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+download_seconds = _register(Histogram(
+    "spimex_download_seconds", "Длительность HTTP-запроса отчёта", ("status",)
+))
+download_bytes = _register(Counter(
+    "spimex_download_bytes_total", "Скачано байт отчётов"
+))
+ingest_stage_seconds = _register(Histogram(
+    "spimex_ingest_stage_seconds",
+    "Длительность этапа загрузки отчёта: open (открытие книги), marker (поиск маркера), "
+    "convert (нормализация строк), db_write (запись в БД)",
+    ("stage",),
+))
+ingest_rows = _register(Counter(
+    "spimex_ingest_rows_total",
+    "Строки снимков при загрузке: created, updated (изменились значения), unchanged (не перезаписаны)",
+    ("result",),
+))
+ingest_cell_errors = _register(Counter(
+    "spimex_ingest_cell_errors_total", "Некорректных ячеек в разобранных отчётах"
+))
+ingest_dates = _register(Counter(
+    "spimex_ingest_dates_total",
+    "Переходы дат загрузки в состояние (non_trading, unchanged, download_error, downloaded, format_error, done)",
+    ("state",),
+))
+view_seconds = _register(Histogram(
+    "django_parser_view_seconds", "Длительность запроса страницы, включая отрисовку шаблона", ("view",)
+))
+view_queries = _register(Histogram(
+    "django_parser_view_queries", "Число SQL-запросов на запрос страницы", ("view",), QUERIES_BUCKETS
+))
+view_responses = _register(Counter(
+    "django_parser_view_responses_total", "Ответы страницы по коду статуса", ("view", "status")
+))
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def count_queries():
+    """
+    Считает SQL-запросы текущего потока: with count_queries() as queries: ...; queries[0]
+    """
+    queries = [0]
+
+    def wrapper(execute, sql, params, many, context):
+        queries[0] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield queries
+
+
+@contextmanager
+def profiled(path: str | None):
+    """
+    Профилирует блок cProfile и сохраняет статистику в path
+    (смотреть: python -m pstats path). При path=None ничего не делает.
+    """
+    if not path:
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_parser', '0002_products'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата отчёта')),
+                ('status', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='HTTP статус')),
+                ('etag', models.CharField(blank=True, max_length=255, verbose_name='ETag')),
+                ('last_modified', models.CharField(blank=True, max_length=64, verbose_name='Last-Modified')),
+                ('size', models.PositiveIntegerField(blank=True, null=True, verbose_name='Размер, байт')),
+                ('content_hash', models.CharField(blank=True, max_length=64, verbose_name='Хэш содержимого')),
+                ('parsed_hash', models.CharField(blank=True, max_length=64, verbose_name='Хэш разобранного содержимого')),
+                ('checked_at', models.DateTimeField(auto_now=True, verbose_name='Проверен')),
+            ],
+            options={
+                'verbose_name': 'Загрузка отчёта',
+                'verbose_name_plural': 'Загрузки отчётов',
+            },
+        ),
+    ]
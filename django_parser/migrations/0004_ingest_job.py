@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_parser', '0003_report_manifest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_from', models.DateField(verbose_name='Дата с')),
+                ('date_to', models.DateField(verbose_name='Дата по')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершена'), ('failed', 'Ошибка')], default='queued', max_length=16, verbose_name='Статус')),
+                ('progress', models.JSONField(blank=True, default=dict, verbose_name='Состояние по датам')),
+                ('stats', models.JSONField(blank=True, default=dict, verbose_name='Итоги')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлена')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начата')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+            ],
+            options={
+                'verbose_name': 'Задача загрузки',
+                'verbose_name_plural': 'Задачи загрузки',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='ingest_job_status_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('date_from', 'date_to'), name='uq_ingest_job_active_range')],
+            },
+        ),
+    ]
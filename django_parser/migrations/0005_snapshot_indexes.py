@@ -0,0 +1,75 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_parser', '0004_ingest_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='marketinstrumentsnapshot',
+            name='date',
+            field=models.DateField(verbose_name='Дата'),
+        ),
+        migrations.AlterField(
+            model_name='marketinstrumentsnapshot',
+            name='instrument_code',
+            field=models.CharField(max_length=64, verbose_name='КодИнструмента'),
+        ),
+        migrations.AddIndex(
+            model_name='marketinstrumentsnapshot',
+            index=models.Index(fields=['date', 'instrument_code'], name='snap_date_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketinstrumentsnapshot',
+            index=models.Index(fields=['instrument_code', 'date'], name='snap_code_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketinstrumentsnapshot',
+            index=models.Index(fields=['instrument_name', 'instrument_code'], name='snap_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketinstrumentsnapshot',
+            index=models.Index(fields=['delivery_basis', 'instrument_code'], name='snap_basis_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketinstrumentsnapshot',
+            index=models.Index(fields=['contracts_volume_ei', 'instrument_code'], name='snap_vol_ei_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketinstrumentsnapshot',
+            index=models.Index(fields=['contracts_volume_rub', 'instrument_code'], name='snap_vol_rub_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketinstrumentsnapshot',
+            index=models.Index(fields=['market_change_rub', 'instrument_code'], name='snap_chg_rub_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketinstrumentsnapshot',
+            index=models.Index(fields=['market_change_pct', 'instrument_code'], name='snap_chg_pct_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketinstrumentsnapshot',
+            index=models.Index(fields=['min_price', 'instrument_code'], name='snap_min_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketinstrumentsnapshot',
+            index=models.Index(fields=['avg_price', 'instrument_code'], name='snap_avg_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketinstrumentsnapshot',
+            index=models.Index(fields=['max_price', 'instrument_code'], name='snap_max_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketinstrumentsnapshot',
+            index=models.Index(fields=['market_price', 'instrument_code'], name='snap_mkt_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketinstrumentsnapshot',
+            index=models.Index(fields=['contracts_count', 'instrument_code'], name='snap_count_idx'),
+        ),
+    ]
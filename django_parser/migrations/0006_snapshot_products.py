@@ -0,0 +1,60 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_existing_snapshots(apps, schema_editor):
+    """
+    Связывает уже загруженные снимки с товарами справочника
+    (название товара входит в product снимка).
+    """
+    Snapshot = apps.get_model('django_parser', 'MarketInstrumentSnapshot')
+    Products = apps.get_model('django_parser', 'Products')
+    SnapshotProduct = apps.get_model('django_parser', 'SnapshotProduct')
+
+    products = [p for p in Products.objects.all() if p.name]
+    matches = {}
+    for value in Snapshot.objects.values_list('product', flat=True).distinct():
+        matched = [p.pk for p in products if p.name in value]
+        if matched:
+            matches[value] = matched
+
+    links = (
+        SnapshotProduct(snapshot_id=pk, product_id=product_id)
+        for pk, value in Snapshot.objects.filter(product__in=list(matches)).values_list('pk', 'product').iterator()
+        for product_id in matches[value]
+    )
+    SnapshotProduct.objects.bulk_create(links, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_parser', '0005_snapshot_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot_links', to='django_parser.products')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_links', to='django_parser.marketinstrumentsnapshot')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='marketinstrumentsnapshot',
+            name='products',
+            field=models.ManyToManyField(blank=True, related_name='snapshots', through='django_parser.SnapshotProduct', to='django_parser.products'),
+        ),
+        migrations.AddIndex(
+            model_name='snapshotproduct',
+            index=models.Index(fields=['product', 'snapshot'], name='snapshot_product_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotproduct',
+            constraint=models.UniqueConstraint(fields=('snapshot', 'product'), name='uq_snapshot_product'),
+        ),
+        migrations.RunPython(link_existing_snapshots, migrations.RunPython.noop),
+    ]
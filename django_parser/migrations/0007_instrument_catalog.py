@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+def fill_catalog(apps, schema_editor):
+    Snapshot = apps.get_model('django_parser', 'MarketInstrumentSnapshot')
+    Instrument = apps.get_model('django_parser', 'Instrument')
+    pairs = Snapshot.objects.values_list('instrument_code', 'instrument_name').distinct().order_by('instrument_code')
+    Instrument.objects.bulk_create(
+        (Instrument(code=code, name=name) for code, name in pairs.iterator()),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_parser', '0006_snapshot_products'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Instrument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=64, verbose_name='КодИнструмента')),
+                ('name', models.CharField(max_length=511, verbose_name='НаименованиеИнструмента')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('code', 'name'), name='uq_instrument_code_name')],
+            },
+        ),
+        migrations.RunPython(fill_catalog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_parser', '0007_instrument_catalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'День'), ('week', 'Неделя'), ('month', 'Месяц')], max_length=8)),
+                ('dimension', models.CharField(choices=[('instrument', 'Инструмент'), ('product', 'Товар')], max_length=16)),
+                ('key', models.CharField(max_length=255)),
+                ('period_start', models.DateField()),
+                ('volume_rub', models.DecimalField(decimal_places=2, default=0, max_digits=24, verbose_name='ОбъемДоговоровРуб')),
+                ('volume_ei', models.DecimalField(decimal_places=6, default=0, max_digits=24, verbose_name='ОбъемДоговоровЕИ')),
+                ('contracts_count', models.PositiveBigIntegerField(default=0, verbose_name='КоличествоДоговоров')),
+                ('min_price', models.DecimalField(blank=True, decimal_places=6, max_digits=20, null=True, verbose_name='МинЦена')),
+                ('max_price', models.DecimalField(blank=True, decimal_places=6, max_digits=20, null=True, verbose_name='МаксЦена')),
+                ('rows', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('period', 'dimension', 'key', 'period_start'), name='uq_rollup_period_key_start')],
+            },
+        ),
+    ]
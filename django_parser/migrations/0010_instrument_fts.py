@@ -0,0 +1,101 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+# Полнотекстовый индекс справочника инструментов (external content FTS5).
+# Триггеры привязаны к таблице django_parser_instrument: если будущая миграция
+# пересоздаст эту таблицу (AlterField на SQLite), триггеры нужно создать заново.
+FTS_SQL = [
+    """
+    CREATE VIRTUAL TABLE instrument_fts USING fts5(
+        code, name, delivery_basis, product,
+        content='django_parser_instrument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER instrument_fts_ai AFTER INSERT ON django_parser_instrument BEGIN
+        INSERT INTO instrument_fts(rowid, code, name, delivery_basis, product)
+        VALUES (new.id, new.code, new.name, new.delivery_basis, new.product);
+    END
+    """,
+    """
+    CREATE TRIGGER instrument_fts_ad AFTER DELETE ON django_parser_instrument BEGIN
+        INSERT INTO instrument_fts(instrument_fts, rowid, code, name, delivery_basis, product)
+        VALUES ('delete', old.id, old.code, old.name, old.delivery_basis, old.product);
+    END
+    """,
+    """
+    CREATE TRIGGER instrument_fts_au AFTER UPDATE ON django_parser_instrument BEGIN
+        INSERT INTO instrument_fts(instrument_fts, rowid, code, name, delivery_basis, product)
+        VALUES ('delete', old.id, old.code, old.name, old.delivery_basis, old.product);
+        INSERT INTO instrument_fts(rowid, code, name, delivery_basis, product)
+        VALUES (new.id, new.code, new.name, new.delivery_basis, new.product);
+    END
+    """,
+]
+
+FTS_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS instrument_fts_au",
+    "DROP TRIGGER IF EXISTS instrument_fts_ad",
+    "DROP TRIGGER IF EXISTS instrument_fts_ai",
+    "DROP TABLE IF EXISTS instrument_fts",
+]
+
+
+def fill_instrument_details(apps, schema_editor):
+    """
+    Базис поставки и товар для уже известных инструментов — по последнему снимку.
+    """
+    Snapshot = apps.get_model('django_parser', 'MarketInstrumentSnapshot')
+    Instrument = apps.get_model('django_parser', 'Instrument')
+    details = {
+        (code, name): (basis, product)
+        for code, name, basis, product in Snapshot.objects.order_by('date').values_list(
+            'instrument_code', 'instrument_name', 'delivery_basis', 'product'
+        ).iterator()
+    }
+    instruments = list(Instrument.objects.all())
+    for instrument in instruments:
+        instrument.delivery_basis, instrument.product = details.get(
+            (instrument.code, instrument.name), (None, '')
+        )
+    Instrument.objects.bulk_update(instruments, ['delivery_basis', 'product'], batch_size=500)
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_SQL:
+        schema_editor.execute(sql)
+    schema_editor.execute("INSERT INTO instrument_fts(instrument_fts) VALUES ('rebuild')")
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_parser', '0009_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instrument',
+            name='delivery_basis',
+            field=models.CharField(blank=True, max_length=128, null=True, verbose_name='БазисПоставки'),
+        ),
+        migrations.AddField(
+            model_name='instrument',
+            name='product',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Товар'),
+        ),
+        migrations.RunPython(fill_instrument_details, migrations.RunPython.noop),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:05
+
+from django.db import migrations
+from django.db.models import F, Value
+from django.db.models.functions import Round
+
+import django_parser.fields
+
+
+# Поле -> (verbose_name, max_digits, decimal_places) целочисленного хранения
+FIXED_POINT_FIELDS = {
+    'contracts_volume_ei': ('ОбъемДоговоровЕИ', 18, 6),
+    'contracts_volume_rub': ('ОбъемДоговоровРуб', 18, 2),
+    'market_change_rub': ('ИзмРынРуб', 18, 2),
+    'market_change_pct': ('ИзмРынПроц', 8, 4),
+    'min_price': ('МинЦена', 18, 6),
+    'avg_price': ('СреднЦена', 18, 6),
+    'max_price': ('МаксЦена', 18, 6),
+    'market_price': ('РынЦена', 18, 6),
+    'best_offer': ('ЛучшПредложение', 18, 6),
+    'best_bid': ('ЛучшСпрос', 18, 6),
+}
+
+
+def scale_up(apps, schema_editor):
+    # Пока колонки десятичные: значения переводятся в единицы 10**-decimal_places,
+    # AlterField затем меняет только тип колонки
+    Snapshot = apps.get_model('django_parser', 'MarketInstrumentSnapshot')
+    Snapshot.objects.using(schema_editor.connection.alias).update(**{
+        name: Round(F(name) * 10 ** places) for name, (_, _, places) in FIXED_POINT_FIELDS.items()
+    })
+
+
+def scale_down(apps, schema_editor):
+    # Делитель float: на SQLite целое, делённое на целое, отбросило бы дробную часть
+    Snapshot = apps.get_model('django_parser', 'MarketInstrumentSnapshot')
+    Snapshot.objects.using(schema_editor.connection.alias).update(**{
+        name: F(name) / Value(float(10 ** places)) for name, (_, _, places) in FIXED_POINT_FIELDS.items()
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_parser', '0010_instrument_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(scale_up, scale_down),
+        *(
+            migrations.AlterField(
+                model_name='marketinstrumentsnapshot',
+                name=name,
+                field=django_parser.fields.FixedPointField(
+                    blank=True, decimal_places=places, max_digits=digits, null=True, verbose_name=verbose_name
+                ),
+            )
+            for name, (verbose_name, digits, places) in FIXED_POINT_FIELDS.items()
+        ),
+    ]
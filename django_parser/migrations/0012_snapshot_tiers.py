@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:05
+
+import django_parser.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_parser', '0011_fixed_point_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TieredSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('instrument_code', models.CharField(max_length=64, verbose_name='КодИнструмента')),
+                ('instrument_name', models.CharField(max_length=511, verbose_name='НаименованиеИнструмента')),
+                ('delivery_basis', models.CharField(blank=True, max_length=128, null=True, verbose_name='БазисПоставки')),
+                ('contracts_volume_ei', django_parser.fields.FixedPointField(blank=True, decimal_places=6, max_digits=18, null=True, verbose_name='ОбъемДоговоровЕИ')),
+                ('contracts_volume_rub', django_parser.fields.FixedPointField(blank=True, decimal_places=2, max_digits=18, null=True, verbose_name='ОбъемДоговоровРуб')),
+                ('market_change_rub', django_parser.fields.FixedPointField(blank=True, decimal_places=2, max_digits=18, null=True, verbose_name='ИзмРынРуб')),
+                ('market_change_pct', django_parser.fields.FixedPointField(blank=True, decimal_places=4, max_digits=8, null=True, verbose_name='ИзмРынПроц')),
+                ('min_price', django_parser.fields.FixedPointField(blank=True, decimal_places=6, max_digits=18, null=True, verbose_name='МинЦена')),
+                ('avg_price', django_parser.fields.FixedPointField(blank=True, decimal_places=6, max_digits=18, null=True, verbose_name='СреднЦена')),
+                ('max_price', django_parser.fields.FixedPointField(blank=True, decimal_places=6, max_digits=18, null=True, verbose_name='МаксЦена')),
+                ('market_price', django_parser.fields.FixedPointField(blank=True, decimal_places=6, max_digits=18, null=True, verbose_name='РынЦена')),
+                ('best_offer', django_parser.fields.FixedPointField(blank=True, decimal_places=6, max_digits=18, null=True, verbose_name='ЛучшПредложение')),
+                ('best_bid', django_parser.fields.FixedPointField(blank=True, decimal_places=6, max_digits=18, null=True, verbose_name='ЛучшСпрос')),
+                ('contracts_count', models.PositiveIntegerField(blank=True, null=True, verbose_name='КоличествоДоговоров')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('product', models.CharField(max_length=255, verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Единица торгов (с архивом)',
+                'verbose_name_plural': 'Данные торгов (с архивом)',
+                'db_table': 'snapshot_tiered',
+                'managed': False,
+            },
+        ),
+    ]
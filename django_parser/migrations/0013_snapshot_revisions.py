@@ -0,0 +1,85 @@
+# Generated by Django 6.0.1 on 2026-10-18 19:05
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Копия revisions.HASH_FIELDS и revisions.values_hash на момент миграции:
+# миграция не должна меняться вместе с кодом приложения. Если хэш в коде
+# изменится, строки со старым хэшем один раз перезапишутся при загрузке.
+HASH_FIELDS = (
+    'delivery_basis',
+    'contracts_volume_ei',
+    'contracts_volume_rub',
+    'market_change_rub',
+    'market_change_pct',
+    'min_price',
+    'avg_price',
+    'max_price',
+    'market_price',
+    'best_offer',
+    'best_bid',
+    'contracts_count',
+    'product',
+)
+
+
+def values_hash(fields, values):
+    h = hashlib.blake2b(digest_size=8)
+    for field, value in zip(fields, values):
+        value = field.get_prep_value(value)
+        h.update(b'\x00' if value is None else str(value).encode())
+        h.update(b'\x1f')
+    return int.from_bytes(h.digest(), 'big', signed=True)
+
+
+def fill_content_hash(apps, schema_editor):
+    # Хэши существующих строк, чтобы первая повторная загрузка
+    # не перезаписала их все
+    Snapshot = apps.get_model('django_parser', 'MarketInstrumentSnapshot')
+    fields = [Snapshot._meta.get_field(name) for name in HASH_FIELDS]
+    table = schema_editor.quote_name(Snapshot._meta.db_table)
+    rows = Snapshot.objects.using(schema_editor.connection.alias).values_list('pk', *HASH_FIELDS)
+    batch = []
+    with schema_editor.connection.cursor() as cursor:
+        for pk, *values in rows.iterator(chunk_size=2000):
+            batch.append((values_hash(fields, values), pk))
+            if len(batch) >= 2000:
+                cursor.executemany(f'UPDATE {table} SET content_hash = %s WHERE id = %s', batch)
+                batch = []
+        if batch:
+            cursor.executemany(f'UPDATE {table} SET content_hash = %s WHERE id = %s', batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_parser', '0012_snapshot_tiers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marketinstrumentsnapshot',
+            name='content_hash',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='ХэшЗначений'),
+        ),
+        migrations.CreateModel(
+            name='SnapshotRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('changes', models.JSONField(verbose_name='Изменения')),
+                ('source_hash', models.CharField(blank=True, max_length=64, verbose_name='Хэш отчёта')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Записана')),
+                ('snapshot', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='revisions', to='django_parser.marketinstrumentsnapshot')),
+            ],
+            options={
+                'verbose_name': 'Правка снимка',
+                'verbose_name_plural': 'Правки снимков',
+                'indexes': [models.Index(fields=['date'], name='snap_revision_date_idx')],
+            },
+        ),
+        migrations.RunPython(fill_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 6.0.1 on 2026-10-18 20:10
+
+from calendar import monthrange
+from datetime import timedelta
+from itertools import groupby
+
+from django.db import migrations
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import Coalesce
+
+
+# Копия rollups.DIMENSION_FIELDS на момент миграции
+DIMENSION_FIELDS = {
+    'instrument': 'instrument_code',
+    'product': 'product',
+}
+
+
+def _week_start(d):
+    return d - timedelta(days=d.weekday())
+
+
+def _periods(dates):
+    # (период, начало, конец) недель и месяцев, в которые попадают даты
+    periods = set()
+    for d in dates:
+        start = _week_start(d)
+        periods.add(('week', start, start + timedelta(days=6)))
+        start = d.replace(day=1)
+        periods.add(('month', start, start.replace(day=monthrange(d.year, d.month)[1])))
+    return sorted(periods)
+
+
+def fill_rollups(apps, schema_editor):
+    # Агрегаты дат, загруженных до 0008: без них /api/trends/ пуст до ручного
+    # rebuild_rollups. Существующие дневные агрегаты (в том числе дат,
+    # перенесённых в архив) не пересчитываются
+    db = schema_editor.connection.alias
+    Snapshot = apps.get_model('django_parser', 'MarketInstrumentSnapshot')
+    Rollup = apps.get_model('django_parser', 'SnapshotRollup')
+    field = Snapshot._meta.get_field
+
+    done = set(Rollup.objects.using(db).filter(period='day').values_list('period_start', flat=True).distinct())
+    dates = [d for d in Snapshot.objects.using(db).dates('date', 'day') if d not in done]
+    if not dates:
+        return
+
+    for _, month_dates in groupby(dates, key=lambda d: (d.year, d.month)):
+        month_dates = list(month_dates)
+        rollups = []
+        for dimension, name in DIMENSION_FIELDS.items():
+            groups = (
+                Snapshot.objects.using(db)
+                .filter(date__in=month_dates)
+                .values('date', key=F(name))
+                .annotate(
+                    volume_rub=Coalesce(Sum('contracts_volume_rub'), 0, output_field=field('contracts_volume_rub')),
+                    volume_ei=Coalesce(Sum('contracts_volume_ei'), 0, output_field=field('contracts_volume_ei')),
+                    count=Coalesce(Sum('contracts_count'), 0),
+                    low=Min('min_price'),
+                    high=Max('max_price'),
+                    n=Count('pk'),
+                )
+                .order_by()
+            )
+            rollups += [
+                Rollup(
+                    period='day', dimension=dimension, key=g['key'], period_start=g['date'],
+                    volume_rub=g['volume_rub'], volume_ei=g['volume_ei'], contracts_count=g['count'],
+                    min_price=g['low'], max_price=g['high'], rows=g['n'],
+                )
+                for g in groups
+            ]
+        Rollup.objects.using(db).bulk_create(rollups, batch_size=500)
+
+    for period, start, end in _periods(dates):
+        Rollup.objects.using(db).filter(period=period, period_start=start).delete()
+        groups = (
+            Rollup.objects.using(db)
+            .filter(period='day', period_start__range=(start, end))
+            .values('dimension', 'key')
+            .annotate(
+                volume_rub=Sum('volume_rub'),
+                volume_ei=Sum('volume_ei'),
+                count=Sum('contracts_count'),
+                low=Min('min_price'),
+                high=Max('max_price'),
+                n=Sum('rows'),
+            )
+            .order_by()
+        )
+        Rollup.objects.using(db).bulk_create([
+            Rollup(
+                period=period, dimension=g['dimension'], key=g['key'], period_start=start,
+                volume_rub=g['volume_rub'], volume_ei=g['volume_ei'], contracts_count=g['count'],
+                min_price=g['low'], max_price=g['high'], rows=g['n'],
+            )
+            for g in groups
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_parser', '0013_snapshot_revisions'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
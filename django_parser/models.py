@@ -1,40 +1,66 @@
+from decimal import Decimal
+
 from django.db import models
 
+from .fields import FixedPointField
+
 
-class MarketInstrumentSnapshot(models.Model):
-    instrument_code = models.CharField("КодИнструмента", max_length=64, db_index=True)
+class SnapshotFields(models.Model):
+    """
+    Поля снимка торгов: общие для таблицы снимков и представления
+    snapshot_tiered, объединяющего её с годовыми архивами (см. tiers.py).
+    """
+    instrument_code = models.CharField("КодИнструмента", max_length=64)
     instrument_name = models.CharField("НаименованиеИнструмента", max_length=511)
 
     delivery_basis = models.CharField("БазисПоставки", max_length=128, blank=True, null=True)
 
-    contracts_volume_ei = models.DecimalField(
-        "ОбъемДоговоровЕИ", max_digits=20, decimal_places=6, blank=True, null=True
+    contracts_volume_ei = FixedPointField(
+        "ОбъемДоговоровЕИ", max_digits=18, decimal_places=6, blank=True, null=True
     )
-    contracts_volume_rub = models.DecimalField(
-        "ОбъемДоговоровРуб", max_digits=20, decimal_places=2, blank=True, null=True
+    contracts_volume_rub = FixedPointField(
+        "ОбъемДоговоровРуб", max_digits=18, decimal_places=2, blank=True, null=True
     )
 
-    market_change_rub = models.DecimalField(
-        "ИзмРынРуб", max_digits=20, decimal_places=2, blank=True, null=True
+    market_change_rub = FixedPointField(
+        "ИзмРынРуб", max_digits=18, decimal_places=2, blank=True, null=True
     )
-    market_change_pct = models.DecimalField(
+    market_change_pct = FixedPointField(
         "ИзмРынПроц", max_digits=8, decimal_places=4, blank=True, null=True
     )
 
-    min_price = models.DecimalField("МинЦена", max_digits=20, decimal_places=6, blank=True, null=True)
-    avg_price = models.DecimalField("СреднЦена", max_digits=20, decimal_places=6, blank=True, null=True)
-    max_price = models.DecimalField("МаксЦена", max_digits=20, decimal_places=6, blank=True, null=True)
-    market_price = models.DecimalField("РынЦена", max_digits=20, decimal_places=6, blank=True, null=True)
+    min_price = FixedPointField("МинЦена", max_digits=18, decimal_places=6, blank=True, null=True)
+    avg_price = FixedPointField("СреднЦена", max_digits=18, decimal_places=6, blank=True, null=True)
+    max_price = FixedPointField("МаксЦена", max_digits=18, decimal_places=6, blank=True, null=True)
+    market_price = FixedPointField("РынЦена", max_digits=18, decimal_places=6, blank=True, null=True)
 
-    best_offer = models.DecimalField("ЛучшПредложение", max_digits=20, decimal_places=6, blank=True, null=True)
-    best_bid = models.DecimalField("ЛучшСпрос", max_digits=20, decimal_places=6, blank=True, null=True)
+    best_offer = FixedPointField("ЛучшПредложение", max_digits=18, decimal_places=6, blank=True, null=True)
+    best_bid = FixedPointField("ЛучшСпрос", max_digits=18, decimal_places=6, blank=True, null=True)
 
     contracts_count = models.PositiveIntegerField("КоличествоДоговоров", blank=True, null=True)
 
-    date = models.DateField("Дата", db_index=True)
+    date = models.DateField("Дата")
 
     product = models.CharField("Товар", max_length=255)
 
+    class Meta:
+        abstract = True
+
+    def __str__(self) -> str:
+        return f"{self.instrument_code} ({self.date})"
+
+
+class MarketInstrumentSnapshot(SnapshotFields):
+    # Хэш нормализованных значений (revisions.HASH_FIELDS): повторная
+    # загрузка отчёта переписывает только строки с другим хэшем
+    content_hash = models.BigIntegerField("ХэшЗначений", blank=True, null=True)
+
+    # Товары из справочника, название которых входит в product;
+    # заполняется при загрузке и при добавлении товара (см. products.py)
+    products = models.ManyToManyField(
+        "Products", through="SnapshotProduct", related_name="snapshots", blank=True
+    )
+
     class Meta:
         verbose_name = "Единица торгов"
         verbose_name_plural = "Данные торгов"
@@ -44,10 +70,249 @@ class MarketInstrumentSnapshot(models.Model):
                 name="uq_instrument_date_product",
             )
         ]
+        # Индексы повторяют ORDER BY списка (SnapshotListView): колонка
+        # сортировки, затем instrument_code и неявно id. Первый индекс
+        # обслуживает и фильтр по диапазону дат, второй — набор инструментов
+        # с сортировкой по дате. Планы проверяет `manage.py check_query_plans`.
+        indexes = [
+            models.Index(fields=["date", "instrument_code"], name="snap_date_code_idx"),
+            models.Index(fields=["instrument_code", "date"], name="snap_code_date_idx"),
+            *(
+                models.Index(fields=[name, "instrument_code"], name=f"snap_{short}_idx")
+                for name, short in (
+                    ("instrument_name", "name"),
+                    ("delivery_basis", "basis"),
+                    ("contracts_volume_ei", "vol_ei"),
+                    ("contracts_volume_rub", "vol_rub"),
+                    ("market_change_rub", "chg_rub"),
+                    ("market_change_pct", "chg_pct"),
+                    ("min_price", "min_price"),
+                    ("avg_price", "avg_price"),
+                    ("max_price", "max_price"),
+                    ("market_price", "mkt_price"),
+                    ("contracts_count", "count"),
+                )
+            ),
+        ]
+
+
+class TieredSnapshot(SnapshotFields):
+    """
+    Снимки горячей таблицы и годовых архивов вместе: временное представление
+    snapshot_tiered, которое создаётся на соединении при первом запросе к нему.
+    Только для чтения; выбирается tiers.snapshot_queryset, когда заданная
+    нижняя граница дат заходит в архив.
+    """
+
+    class Meta:
+        managed = False
+        db_table = "snapshot_tiered"
+        verbose_name = "Единица торгов (с архивом)"
+        verbose_name_plural = "Данные торгов (с архивом)"
+
+
+class SnapshotRevision(models.Model):
+    """
+    Правка снимка при повторной загрузке отчёта: старые и новые значения
+    изменившихся полей, {поле: [было, стало]} в единицах модели.
+    Связь без ограничения в БД: снимок может быть перенесён в годовой архив.
+    """
+    snapshot = models.ForeignKey(
+        MarketInstrumentSnapshot, on_delete=models.DO_NOTHING, db_constraint=False, related_name="revisions"
+    )
+    date = models.DateField("Дата")
+    changes = models.JSONField("Изменения")
+    # content_hash файла отчёта из манифеста, если известен
+    source_hash = models.CharField("Хэш отчёта", max_length=64, blank=True)
+    created_at = models.DateTimeField("Записана", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Правка снимка"
+        verbose_name_plural = "Правки снимков"
+        indexes = [
+            models.Index(fields=["date"], name="snap_revision_date_idx"),
+        ]
 
     def __str__(self) -> str:
-        return f"{self.instrument_code} ({self.date})"
+        return f"{self.snapshot_id} ({self.date}): {', '.join(self.changes)}"
 
 
 class Products(models.Model):
     name = models.CharField(verbose_name='Ресурс', max_length=255)
+
+
+class Instrument(models.Model):
+    """
+    Справочник инструментов (пары код — наименование), встречавшихся
+    в отчётах. Пополняется при загрузке, чтобы форма фильтра не делала
+    SELECT DISTINCT по всей таблице снимков. На SQLite по нему ведётся
+    полнотекстовый индекс instrument_fts (FTS5, синхронизируется триггерами).
+    """
+    code = models.CharField("КодИнструмента", max_length=64)
+    name = models.CharField("НаименованиеИнструмента", max_length=511)
+    delivery_basis = models.CharField("БазисПоставки", max_length=128, blank=True, null=True)
+    product = models.CharField("Товар", max_length=255, blank=True, default="")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["code", "name"], name="uq_instrument_code_name")
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.code} — {self.name}"
+
+
+class SnapshotProduct(models.Model):
+    """
+    Связь снимка с товаром справочника. Фильтр списка по товару — равенство
+    по индексу (product, snapshot) вместо поиска подстроки по всем строкам.
+    """
+    snapshot = models.ForeignKey(MarketInstrumentSnapshot, on_delete=models.CASCADE, related_name="product_links")
+    product = models.ForeignKey(Products, on_delete=models.CASCADE, related_name="snapshot_links")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["snapshot", "product"], name="uq_snapshot_product")
+        ]
+        indexes = [
+            models.Index(fields=["product", "snapshot"], name="snapshot_product_idx"),
+        ]
+
+
+class ReportManifest(models.Model):
+    """
+    Сведения о последней загрузке отчёта за торговый день:
+    validators для условного GET, размер и хэш содержимого, а также хэш
+    последней успешно разобранной версии файла.
+    """
+    date = models.DateField("Дата отчёта", unique=True)
+    status = models.PositiveSmallIntegerField("HTTP статус", null=True, blank=True)
+    etag = models.CharField("ETag", max_length=255, blank=True)
+    last_modified = models.CharField("Last-Modified", max_length=64, blank=True)
+    size = models.PositiveIntegerField("Размер, байт", null=True, blank=True)
+    content_hash = models.CharField("Хэш содержимого", max_length=64, blank=True)
+    parsed_hash = models.CharField("Хэш разобранного содержимого", max_length=64, blank=True)
+    checked_at = models.DateTimeField("Проверен", auto_now=True)
+
+    class Meta:
+        verbose_name = "Загрузка отчёта"
+        verbose_name_plural = "Загрузки отчётов"
+
+    def __str__(self) -> str:
+        return f"{self.date} ({self.status})"
+
+    @property
+    def is_parsed(self) -> bool:
+        return bool(self.content_hash) and self.content_hash == self.parsed_hash
+
+    @property
+    def is_known_non_trading_day(self) -> bool:
+        """
+        404, полученный уже после окончания дня отчёта, окончателен:
+        отчёт за этот день больше не появится.
+        """
+        return self.status == 404 and self.date < self.checked_at.date()
+
+
+class IngestJob(models.Model):
+    """
+    Задача фоновой загрузки отчётов за диапазон дат. Очередь хранится в БД;
+    активная (в очереди или выполняющаяся) задача на один и тот же диапазон
+    может быть только одна.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "В очереди"
+        RUNNING = "running", "Выполняется"
+        DONE = "done", "Завершена"
+        FAILED = "failed", "Ошибка"
+
+    ACTIVE_STATUSES = (Status.QUEUED, Status.RUNNING)
+
+    date_from = models.DateField("Дата с")
+    date_to = models.DateField("Дата по")
+    status = models.CharField("Статус", max_length=16, choices=Status.choices, default=Status.QUEUED)
+    progress = models.JSONField("Состояние по датам", default=dict, blank=True)
+    stats = models.JSONField("Итоги", default=dict, blank=True)
+    error = models.TextField("Ошибка", blank=True)
+    created_at = models.DateTimeField("Создана", auto_now_add=True)
+    updated_at = models.DateTimeField("Обновлена", auto_now=True)
+    started_at = models.DateTimeField("Начата", null=True, blank=True)
+    finished_at = models.DateTimeField("Завершена", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Задача загрузки"
+        verbose_name_plural = "Задачи загрузки"
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="ingest_job_status_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date_from", "date_to"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="uq_ingest_job_active_range",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.date_from} — {self.date_to} ({self.status})"
+
+
+# Цены снимков хранятся с 6 знаками после запятой
+PRICE_QUANTUM = Decimal("0.000001")
+
+
+class SnapshotRollup(models.Model):
+    """
+    Агрегаты торгов за день, ISO-неделю или месяц по инструменту или товару.
+    Хранятся суммы, поэтому средневзвешенная цена (vwap) и агрегаты
+    более длинных периодов считаются без обращения к снимкам.
+    Пересчитываются при загрузке отчёта (см. rollups.py).
+    """
+
+    class Period(models.TextChoices):
+        DAY = "day", "День"
+        WEEK = "week", "Неделя"
+        MONTH = "month", "Месяц"
+
+    class Dimension(models.TextChoices):
+        INSTRUMENT = "instrument", "Инструмент"
+        PRODUCT = "product", "Товар"
+
+    period = models.CharField(max_length=8, choices=Period.choices)
+    dimension = models.CharField(max_length=16, choices=Dimension.choices)
+    # Код инструмента или название товара
+    key = models.CharField(max_length=255)
+    # День, понедельник недели или первое число месяца
+    period_start = models.DateField()
+
+    volume_rub = models.DecimalField("ОбъемДоговоровРуб", max_digits=24, decimal_places=2, default=0)
+    volume_ei = models.DecimalField("ОбъемДоговоровЕИ", max_digits=24, decimal_places=6, default=0)
+    contracts_count = models.PositiveBigIntegerField("КоличествоДоговоров", default=0)
+    min_price = models.DecimalField("МинЦена", max_digits=20, decimal_places=6, blank=True, null=True)
+    max_price = models.DecimalField("МаксЦена", max_digits=20, decimal_places=6, blank=True, null=True)
+    rows = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period", "dimension", "key", "period_start"],
+                name="uq_rollup_period_key_start",
+            )
+        ]
+
+    @property
+    def vwap(self):
+        if not self.volume_ei:
+            return None
+        return (self.volume_rub / self.volume_ei).quantize(PRICE_QUANTUM)
+
+
+class DataVersion(models.Model):
+    """
+    Счётчик версии данных (одна строка). Увеличивается при каждой записи
+    снимков и пересчёте связей с товарами; ключи кэша страниц и ETag
+    строятся от него, поэтому кэш сбрасывается сразу во всех процессах.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
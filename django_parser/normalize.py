@@ -0,0 +1,187 @@
+"""
+Векторная нормализация блока данных отчёта.
+
+Блок транспонируется в колонки, и каждая колонка приводится к типу целиком
+в numpy: "-" и пустые ячейки -> NULL, пробелы-разделители тысяч удаляются,
+десятичная запятая заменяется точкой, значения округляются до decimal_places
+поля модели и проверяются на max_digits. Числовые ячейки xlrd уже отдаёт
+числами, поэтому построчная очистка касается только текстовых ячеек.
+Некорректные ячейки не прерывают загрузку, а возвращаются списком ошибок.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+import numpy as np
+from xlrd import colname
+
+from .models import MarketInstrumentSnapshot
+
+
+# Номер колонки листа -> поле модели
+COLUMNS = {
+    1: "instrument_code",
+    2: "instrument_name",
+    3: "delivery_basis",
+    4: "contracts_volume_ei",
+    5: "contracts_volume_rub",
+    6: "market_change_rub",
+    7: "market_change_pct",
+    8: "min_price",
+    9: "avg_price",
+    10: "max_price",
+    11: "market_price",
+    12: "best_offer",
+    13: "best_bid",
+    14: "contracts_count",
+}
+REQUIRED_FIELDS = ("instrument_code", "instrument_name")
+TEXT_FIELDS = ("instrument_code", "instrument_name", "delivery_basis")
+INT_FIELDS = ("contracts_count",)
+DECIMAL_FIELDS = tuple(
+    name for name in COLUMNS.values() if name not in TEXT_FIELDS and name not in INT_FIELDS
+)
+
+NULL_VALUES = frozenset({"", "-", "nan", "None"})
+
+# Удаление пробелов (в т.ч. неразрывных) и замена десятичной запятой за один проход
+NUMBER_TRANSLATION = str.maketrans({" ": None, "\u00a0": None, "\t": None, "\n": None, ",": "."})
+
+
+@dataclass
+class CellError:
+    """
+    Некорректная ячейка отчёта. row — номер строки листа (с 1, как в Excel).
+    """
+    row: int
+    column: str
+    field: str
+    value: any
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.column}{self.row} ({self.field}): {self.message}: {self.value!r}"
+
+
+def _field(name):
+    return MarketInstrumentSnapshot._meta.get_field(name)
+
+
+def _is_null(v) -> bool:
+    return v is None or str(v).strip() in NULL_VALUES
+
+
+def _parse_numbers(values: tuple) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Возвращает (числа float64 с NaN вместо NULL, маска некорректных значений).
+    """
+    n = len(values)
+    try:
+        # Колонка целиком из чисел — конвертация одним вызовом
+        numbers = np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        pass
+    else:
+        bad = np.isinf(numbers)
+        numbers[bad] = np.nan
+        return numbers, bad
+
+    is_number = np.fromiter(
+        (type(v) is float or type(v) is int for v in values), dtype=bool, count=n
+    )
+    numbers = np.full(n, np.nan)
+    numbers[is_number] = np.array(values, dtype=object)[is_number].astype(float)
+
+    bad = np.zeros(n, dtype=bool)
+    for i in np.flatnonzero(~is_number).tolist():
+        if values[i] is None:
+            continue
+        s = str(values[i]).translate(NUMBER_TRANSLATION)
+        if s in NULL_VALUES:
+            continue
+        try:
+            numbers[i] = float(s)
+        except ValueError:
+            bad[i] = True
+    bad |= np.isinf(numbers)
+    numbers[bad] = np.nan
+    return numbers, bad
+
+
+def _to_decimals(numbers: np.ndarray, decimal_places: int) -> list:
+    """
+    Масштабирование до целых выполняется векторно,
+    Decimal собирается из целого без разбора строки.
+    """
+    null = np.isnan(numbers)
+    scaled = np.rint(np.where(null, 0, numbers) * 10 ** decimal_places).astype(np.int64)
+    return [
+        None if n else Decimal(i).scaleb(-decimal_places)
+        for i, n in zip(scaled.tolist(), null.tolist())
+    ]
+
+
+def normalize_report(rows: list[tuple[int, list]]) -> tuple[list[dict], list[CellError]]:
+    """
+    Нормализует строки отчёта (номер строки листа, значения ячеек).
+    Возвращает (значения полей снимков по строкам, ошибки ячеек).
+    Строки без кода или наименования инструмента пропускаются, прочие
+    некорректные ячейки записываются как NULL.
+    """
+    if not rows:
+        return [], []
+
+    width = max(COLUMNS) + 1
+    sheet_rows = [index for index, _ in rows]
+    columns = list(zip(*(list(values[:width]) + [""] * (width - len(values)) for _, values in rows)))
+
+    errors = []
+    skip = np.zeros(len(rows), dtype=bool)
+    values = {}
+
+    def report(mask: np.ndarray, idx: int, message: str):
+        for pos in np.flatnonzero(mask).tolist():
+            errors.append(
+                CellError(sheet_rows[pos] + 1, colname(idx), COLUMNS[idx], columns[idx][pos], message)
+            )
+
+    for idx, name in COLUMNS.items():
+        column = columns[idx]
+
+        if name in TEXT_FIELDS:
+            max_length = _field(name).max_length
+            text = [None if _is_null(v) else str(v).strip() for v in column]
+            null = np.fromiter((v is None for v in text), dtype=bool, count=len(text))
+            too_long = np.fromiter(
+                (v is not None and len(v) > max_length for v in text), dtype=bool, count=len(text)
+            )
+            report(too_long, idx, "слишком длинное значение")
+            if name in REQUIRED_FIELDS:
+                report(null, idx, "обязательное значение не задано")
+                skip |= null | too_long
+            values[name] = [None if long else v for v, long in zip(text, too_long.tolist())]
+
+        elif name in INT_FIELDS:
+            numbers, bad = _parse_numbers(column)
+            invalid = ~np.isnan(numbers) & ((numbers % 1 != 0) | (numbers < 0))
+            report(bad | invalid, idx, "некорректное int значение")
+            numbers[invalid] = np.nan
+            values[name] = [None if x != x else int(x) for x in numbers.tolist()]
+
+        else:
+            field = _field(name)
+            numbers, bad = _parse_numbers(column)
+            numbers = np.round(numbers, field.decimal_places)
+            overflow = np.abs(np.nan_to_num(numbers)) >= 10 ** (field.max_digits - field.decimal_places)
+            report(bad, idx, "некорректное decimal значение")
+            report(overflow, idx, f"больше {field.max_digits} значащих цифр")
+            numbers[overflow] = np.nan
+            values[name] = _to_decimals(numbers, field.decimal_places)
+
+    values["product"] = [None if v is None else v.split(",")[0] for v in values["instrument_name"]]
+
+    names = list(values)
+    keep = (~skip).tolist()
+    return [
+        dict(zip(names, row))
+        for row, k in zip(zip(*(values[name] for name in names)), keep) if k
+    ], errors
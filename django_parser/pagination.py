@@ -0,0 +1,205 @@
+"""
+Постраничный вывод больших таблиц.
+
+KeysetPaginator — пагинация по курсору (seek): следующая страница
+выбирается условием "после последней строки" по ключам сортировки,
+поэтому запрос не делает OFFSET и его стоимость не растёт с номером
+страницы. CachedCountPaginator — обычный Paginator, у которого COUNT(*)
+кэшируется до изменения данных (не дольше SNAPSHOT_COUNT_CACHE_SECONDS).
+"""
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .dataversion import current_data_version
+
+
+def cached_count(queryset) -> int:
+    """
+    COUNT(*) для queryset с кэшированием по тексту запроса и версии данных.
+    """
+    timeout = getattr(settings, "SNAPSHOT_COUNT_CACHE_SECONDS", 300)
+    sql = str(queryset.order_by().query)
+    key = f"count:{current_data_version().version}:" + hashlib.sha1(sql.encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list)
+
+
+class KeysetPage:
+    """
+    Страница курсорной пагинации. Совместима с шаблонами в части
+    object_list, has_next, has_previous и итерации.
+    """
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+class KeysetPaginator:
+    """
+    ordering — поля сортировки в нотации order_by ("-market_price",
+    "-instrument_code"); для однозначности в конец добавляется pk
+    в направлении последнего поля.
+
+    Курсор — base64 от JSON с направлением ("next", "prev" или "last")
+    и значениями ключей сортировки граничной строки.
+    """
+
+    FIRST, NEXT, PREV, LAST = "first", "next", "prev", "last"
+
+    def __init__(self, queryset, per_page: int, ordering: list[str]):
+        self.queryset = queryset
+        self.per_page = per_page
+        if not {"pk", "-pk", "id", "-id"} & set(ordering):
+            ordering = [*ordering, "-pk" if ordering and ordering[-1].startswith("-") else "pk"]
+        self.ordering = [(name.lstrip("-"), name.startswith("-")) for name in ordering]
+        self.nulls_smallest = connections[queryset.db].features.order_by_nulls_first
+
+    def count(self) -> int:
+        return cached_count(self.queryset)
+
+    # Курсоры
+
+    def _signature(self) -> str:
+        return ",".join(f"{'-' if desc else ''}{name}" for name, desc in self.ordering)
+
+    def encode_cursor(self, direction: str, obj=None) -> str:
+        payload = {"d": direction, "o": self._signature()}
+        if obj is not None:
+            payload["v"] = [self._key_value(obj, name) for name, _ in self.ordering]
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str | None) -> tuple[str, list | None]:
+        """
+        Возвращает (направление, значения ключей). Повреждённый курсор или
+        курсор от другой сортировки означает первую страницу.
+        """
+        if not cursor:
+            return self.FIRST, None
+        if cursor == self.LAST:
+            return self.LAST, None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            direction = payload["d"]
+            if payload["o"] != self._signature() or direction not in (self.NEXT, self.PREV, self.LAST):
+                return self.FIRST, None
+            values = payload.get("v")
+            if values is None:
+                return direction, None
+            values = [
+                None if v is None else self._field(name).to_python(v)
+                for (name, _), v in zip(self.ordering, values, strict=True)
+            ]
+            # Значение вне диапазона поля не должно дойти до запроса
+            for (name, _), v in zip(self.ordering, values):
+                if v is not None:
+                    self._field(name).get_prep_value(v)
+        except (ValueError, KeyError, TypeError, ValidationError):
+            return self.FIRST, None
+        return direction, values
+
+    def _field(self, name):
+        meta = self.queryset.model._meta
+        return meta.pk if name == "pk" else meta.get_field(name)
+
+    def _key_value(self, obj, name):
+        value = getattr(obj, self._field(name).attname)
+        if value is None or isinstance(value, (int, float, str)):
+            return value
+        return str(value)
+
+    # Условие "после строки"
+
+    def _after(self, name: str, desc: bool, value) -> Q:
+        nulls_first = self.nulls_smallest != desc
+        if value is None:
+            return Q(**{f"{name}__isnull": False}) if nulls_first else Q(pk__in=[])
+        after = Q(**{f"{name}__{'lt' if desc else 'gt'}": value})
+        if not nulls_first and self._field(name).null:
+            after |= Q(**{f"{name}__isnull": True})
+        return after
+
+    def _equal(self, name: str, value) -> Q:
+        if value is None:
+            return Q(**{f"{name}__isnull": True})
+        return Q(**{name: value})
+
+    def _seek(self, ordering, values) -> Q:
+        condition = Q(pk__in=[])
+        prefix = Q()
+        for (name, desc), value in zip(ordering, values):
+            condition |= prefix & self._after(name, desc, value)
+            prefix &= self._equal(name, value)
+        return condition
+
+    def page_queryset(self, cursor: str | None):
+        """
+        Запрос страницы: (направление, queryset на per_page + 1 строк).
+        """
+        direction, values = self.decode_cursor(cursor)
+        backward = direction in (self.PREV, self.LAST)
+        ordering = [(name, desc != backward) for name, desc in self.ordering]
+
+        qs = self.queryset.order_by(*(f"{'-' if desc else ''}{name}" for name, desc in ordering))
+        if values is not None:
+            qs = qs.filter(self._seek(ordering, values))
+        return direction, qs[:self.per_page + 1]
+
+    def page(self, cursor: str | None) -> KeysetPage:
+        direction, qs = self.page_queryset(cursor)
+        backward = direction in (self.PREV, self.LAST)
+
+        rows = list(qs)
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backward:
+            rows.reverse()
+            has_next = direction == self.PREV
+            has_previous = more
+        else:
+            has_next = more
+            has_previous = direction == self.NEXT
+
+        return KeysetPage(
+            rows,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=self.encode_cursor(self.NEXT, rows[-1]) if has_next and rows else None,
+            previous_cursor=self.encode_cursor(self.PREV, rows[0]) if has_previous and rows else None,
+        )
@@ -0,0 +1,54 @@
+"""
+Связи снимков с товарами справочника Products.
+
+Снимок относится к товару, если название товара входит в поле product
+снимка (как в прежнем фильтре product__contains). Сопоставление делается
+по различным значениям product, а не по каждой строке.
+"""
+from django.db import transaction
+
+from .dataversion import bump_data_version
+from .models import MarketInstrumentSnapshot, Products, SnapshotProduct
+
+
+def match_products(value: str, products: list[Products]) -> list[Products]:
+    return [p for p in products if p.name and p.name in value]
+
+
+def link_products(snapshots=None, products=None) -> int:
+    """
+    Добавляет недостающие связи снимков (queryset, по умолчанию все)
+    с товарами (по умолчанию весь справочник). Возвращает число связей-кандидатов.
+    """
+    if snapshots is None:
+        snapshots = MarketInstrumentSnapshot.objects.all()
+    products = list(Products.objects.all() if products is None else products)
+    if not products:
+        return 0
+
+    matches = {}
+    for value in snapshots.values_list("product", flat=True).distinct():
+        matched = match_products(value, products)
+        if matched:
+            matches[value] = matched
+
+    links = [
+        SnapshotProduct(snapshot_id=pk, product=product)
+        for pk, value in snapshots.filter(product__in=list(matches)).values_list("pk", "product").iterator()
+        for product in matches[value]
+    ]
+    SnapshotProduct.objects.bulk_create(links, batch_size=500, ignore_conflicts=True)
+    return len(links)
+
+
+@transaction.atomic
+def relink_product(product: Products) -> int:
+    """
+    Пересчитывает связи одного товара, например после его добавления.
+    Поиск подстроки по таблице выполняется здесь один раз, а не в каждом запросе списка.
+    """
+    SnapshotProduct.objects.filter(product=product).delete()
+    bump_data_version()
+    if not product.name:
+        return 0
+    return link_products(MarketInstrumentSnapshot.objects.filter(product__contains=product.name), [product])
@@ -0,0 +1,118 @@
+"""
+Разбор XLS-отчёта SPIMEX за один проход.
+
+Книга открывается один раз, поиск маркеров и выборка блока данных идут
+по ячейкам листа xlrd без построения DataFrame.
+"""
+import os
+
+import xlrd
+
+from . import metrics
+
+
+START_MARKER = "Единица измерения: Метрическая тонна".lower()
+END_MARKER = "Итого:".lower()
+
+# Строка маркера, две строки шапки и строка с номерами колонок
+HEADER_ROWS = 4
+
+
+class ReportFormatError(ValueError):
+    """Отчёт не соответствует ожидаемой структуре (например, нет маркера)."""
+
+
+def open_sheet(source: bytes | str | os.PathLike, sheet: int | str = 0) -> xlrd.sheet.Sheet:
+    """
+    Открывает лист книги из содержимого файла или по пути.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        book = xlrd.open_workbook(file_contents=source, on_demand=True)
+    else:
+        book = xlrd.open_workbook(os.fspath(source), on_demand=True)
+    if isinstance(sheet, int):
+        return book.sheet_by_index(sheet)
+    return book.sheet_by_name(sheet)
+
+
+def column_index(column: str) -> int:
+    return ord(column.upper()) - ord("A")
+
+
+def find_row_index_by_marker(
+    sh: xlrd.sheet.Sheet,
+    marker: str = START_MARKER,
+    column: str = "B",
+    start_index: int = 0,
+    contains: bool = False,
+) -> int | None:
+    """
+    Возвращает индекс первой строки, в которой колонка column совпадает
+    с marker (или содержит его при contains=True), либо None.
+    """
+    col_idx = column_index(column)
+    if col_idx >= sh.ncols:
+        return None
+
+    m = marker.strip().lower()
+    for offset, value in enumerate(sh.col_values(col_idx, start_rowx=start_index)):
+        s = str(value).strip().lower()
+        if (m in s) if contains else (s == m):
+            return start_index + offset
+    return None
+
+
+def find_row_index_by_marker_xls(
+    xls_path: str,
+    marker: str = START_MARKER,
+    sheet: int | str = 0,
+    column: str = "B",
+    start_index: int = 0,
+    contains: bool = False,
+) -> int | None:
+    return find_row_index_by_marker(open_sheet(xls_path, sheet), marker, column, start_index, contains)
+
+
+def cell_value(value):
+    # xlrd отдаёт все числа как float; целые приводим к int, как это делал pandas
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def find_block_end(sh: xlrd.sheet.Sheet, start_index: int, column: str = "B") -> int:
+    """
+    Конец блока данных: строка "Итого:", а если её нет — первая строка
+    с пустой колонкой column или конец листа.
+    """
+    end = find_row_index_by_marker(sh, END_MARKER, column, start_index)
+    if end is not None:
+        return end
+
+    col_idx = column_index(column)
+    for offset, value in enumerate(sh.col_values(col_idx, start_rowx=start_index)):
+        if str(value).strip() == "":
+            return start_index + offset
+    return sh.nrows
+
+
+def read_report_rows(source: bytes | str | os.PathLike, sheet: int | str = 0) -> list[tuple[int, list]]:
+    """
+    Читает блок данных отчёта (в метрических тоннах).
+    Возвращает пары (номер строки листа, значения ячеек строки).
+    """
+    with metrics.ingest_stage_seconds.time(stage="open"):
+        sh = open_sheet(source, sheet)
+
+    with metrics.ingest_stage_seconds.time(stage="marker"):
+        marker_index = find_row_index_by_marker(sh)
+        if marker_index is None:
+            raise ReportFormatError(f'Не найден маркер "{START_MARKER}"')
+
+        start_parse_index = marker_index + HEADER_ROWS
+        end_parse_index = find_block_end(sh, start_parse_index)
+
+    return [
+        (i, [cell_value(v) for v in sh.row_values(i)])
+        for i in range(start_parse_index, end_parse_index)
+    ]
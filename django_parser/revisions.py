@@ -0,0 +1,90 @@
+"""
+Обнаружение изменённых строк при повторной загрузке отчёта и журнал правок.
+
+У снимка хранится content_hash — 64-битный хэш значений HASH_FIELDS в том
+виде, в каком они пишутся в БД (FixedPointField — целым), поэтому
+Decimal("1.5") и Decimal("1.50") дают одинаковый хэш. Загрузка сравнивает
+хэши пачкой и пишет только новые и изменившиеся строки (ingest.bulk_upsert_snapshots),
+а для изменившихся записывает в SnapshotRevision отличающиеся поля.
+"""
+import hashlib
+
+from .models import MarketInstrumentSnapshot, SnapshotRevision
+
+
+# Значения снимка кроме ключа (код, наименование, дата)
+HASH_FIELDS = (
+    "delivery_basis",
+    "contracts_volume_ei",
+    "contracts_volume_rub",
+    "market_change_rub",
+    "market_change_pct",
+    "min_price",
+    "avg_price",
+    "max_price",
+    "market_price",
+    "best_offer",
+    "best_bid",
+    "contracts_count",
+    "product",
+)
+
+
+def values_hash(fields, values) -> int:
+    """
+    Хэш значений полей fields (поля модели, в том числе исторической
+    в миграции) как знаковое 64-битное целое.
+    """
+    h = hashlib.blake2b(digest_size=8)
+    for field, value in zip(fields, values):
+        value = field.get_prep_value(value)
+        h.update(b"\x00" if value is None else str(value).encode())
+        h.update(b"\x1f")
+    return int.from_bytes(h.digest(), "big", signed=True)
+
+
+_fields = [MarketInstrumentSnapshot._meta.get_field(name) for name in HASH_FIELDS]
+
+
+def snapshot_hash(obj: MarketInstrumentSnapshot) -> int:
+    return values_hash(_fields, [getattr(obj, name) for name in HASH_FIELDS])
+
+
+def _as_json(value):
+    return None if value is None else str(value)
+
+
+def diff_values(old: dict, obj: MarketInstrumentSnapshot) -> dict[str, list]:
+    """
+    {поле: [было, стало]} для полей, значения которых в БД различаются.
+    """
+    changes = {}
+    for field in _fields:
+        before, after = old[field.name], getattr(obj, field.name)
+        if field.get_prep_value(before) != field.get_prep_value(after):
+            changes[field.name] = [_as_json(before), _as_json(field.to_python(after))]
+    return changes
+
+
+def record_revisions(changed: list[tuple[int, MarketInstrumentSnapshot]], source_hash: str = "") -> int:
+    """
+    Записывает правки для пар (pk существующего снимка, новые значения)
+    до их перезаписи. Строки без отличий (например, ещё без content_hash)
+    правок не дают. Возвращает число правок.
+    """
+    if not changed:
+        return 0
+    old = {
+        row["pk"]: row
+        for row in MarketInstrumentSnapshot.objects
+        .filter(pk__in=[pk for pk, _ in changed])
+        .values("pk", *HASH_FIELDS)
+    }
+    revisions = []
+    for pk, obj in changed:
+        changes = diff_values(old[pk], obj)
+        if changes:
+            revisions.append(SnapshotRevision(snapshot_id=pk, date=obj.date, changes=changes,
+                                              source_hash=source_hash))
+    SnapshotRevision.objects.bulk_create(revisions, batch_size=500)
+    return len(revisions)
@@ -0,0 +1,122 @@
+"""
+Пересчёт агрегатов SnapshotRollup.
+
+Дневные агрегаты считаются по снимкам одной даты, недельные и месячные —
+по дневным агрегатам своего периода, поэтому загрузка отчёта за день
+пересчитывает небольшое число строк, а повторная загрузка просто
+заменяет их. Вызывается из save_report в транзакции записи снимков.
+"""
+from calendar import monthrange
+from datetime import date, timedelta
+
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import Coalesce
+
+from .models import MarketInstrumentSnapshot, SnapshotRollup
+
+Period = SnapshotRollup.Period
+Dimension = SnapshotRollup.Dimension
+
+# Поле снимка, по которому группируется каждое измерение
+DIMENSION_FIELDS = {
+    Dimension.INSTRUMENT: "instrument_code",
+    Dimension.PRODUCT: "product",
+}
+
+
+def _field(name):
+    return MarketInstrumentSnapshot._meta.get_field(name)
+
+
+def period_start(period: str, d: date) -> date:
+    if period == Period.WEEK:
+        return d - timedelta(days=d.weekday())
+    if period == Period.MONTH:
+        return d.replace(day=1)
+    return d
+
+
+def period_end(period: str, start: date) -> date:
+    if period == Period.WEEK:
+        return start + timedelta(days=6)
+    if period == Period.MONTH:
+        return start.replace(day=monthrange(start.year, start.month)[1])
+    return start
+
+
+def _replace(period: str, dimension: str, start: date, groups) -> int:
+    SnapshotRollup.objects.filter(period=period, dimension=dimension, period_start=start).delete()
+    rollups = [
+        SnapshotRollup(
+            period=period,
+            dimension=dimension,
+            period_start=start,
+            key=group["key"],
+            volume_rub=group["sum_volume_rub"],
+            volume_ei=group["sum_volume_ei"],
+            contracts_count=group["sum_contracts_count"],
+            min_price=group["min_min_price"],
+            max_price=group["max_max_price"],
+            rows=group["n_rows"],
+        )
+        for group in groups
+    ]
+    SnapshotRollup.objects.bulk_create(rollups, batch_size=500)
+    return len(rollups)
+
+
+def rebuild_day(d: date) -> int:
+    snapshots = MarketInstrumentSnapshot.objects.filter(date=d)
+    total = 0
+    for dimension, field in DIMENSION_FIELDS.items():
+        groups = (
+            snapshots
+            .values(key=F(field))
+            .annotate(
+                sum_volume_rub=Coalesce(Sum("contracts_volume_rub"), 0, output_field=_field("contracts_volume_rub")),
+                sum_volume_ei=Coalesce(Sum("contracts_volume_ei"), 0, output_field=_field("contracts_volume_ei")),
+                sum_contracts_count=Coalesce(Sum("contracts_count"), 0),
+                min_min_price=Min("min_price"),
+                max_max_price=Max("max_price"),
+                n_rows=Count("pk"),
+            )
+            .order_by()
+        )
+        total += _replace(Period.DAY, dimension, d, groups)
+    return total
+
+
+def rebuild_period(period: str, start: date) -> int:
+    days = SnapshotRollup.objects.filter(
+        period=Period.DAY, period_start__range=(start, period_end(period, start))
+    )
+    total = 0
+    for dimension in DIMENSION_FIELDS:
+        groups = (
+            days.filter(dimension=dimension)
+            .values("key")
+            .annotate(
+                sum_volume_rub=Sum("volume_rub"),
+                sum_volume_ei=Sum("volume_ei"),
+                sum_contracts_count=Sum("contracts_count"),
+                min_min_price=Min("min_price"),
+                max_max_price=Max("max_price"),
+                n_rows=Sum("rows"),
+            )
+            .order_by()
+        )
+        total += _replace(period, dimension, start, groups)
+    return total
+
+
+def update_rollups(dates) -> int:
+    """
+    Пересчитывает дневные агрегаты дат и недельные/месячные агрегаты
+    затронутых периодов. Возвращает число записанных строк.
+    """
+    dates = sorted(set(dates))
+    total = sum(rebuild_day(d) for d in dates)
+    for period in (Period.WEEK, Period.MONTH):
+        for start in sorted({period_start(period, d) for d in dates}):
+            total += rebuild_period(period, start)
+    return total
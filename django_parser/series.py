@@ -0,0 +1,141 @@
+"""
+Временные ряды инструмента для графиков с прореживанием на сервере.
+
+Ряд читается по индексу (instrument_code, date) и при необходимости
+сокращается до заданного числа точек:
+  lttb — Largest-Triangle-Three-Buckets по market_price: выбираются
+         реальные точки, сохраняющие форму графика;
+  ohlc — равные по времени интервалы с open/high/low/close рыночной цены,
+         средневзвешенной по объёму avg_price и суммарным объёмом.
+"""
+from datetime import date
+
+import numpy as np
+
+from .tiers import snapshot_queryset
+
+
+SERIES_FIELDS = ("date", "market_price", "avg_price", "contracts_volume_ei")
+DOWNSAMPLE_METHODS = ("lttb", "ohlc")
+OHLC_FIELDS = ("date", "open", "high", "low", "close", "avg_price", "volume_ei")
+
+
+def series_queryset(code: str, date_from: date | None = None, date_to: date | None = None):
+    qs = snapshot_queryset(date_from).filter(instrument_code=code)
+    if date_from:
+        qs = qs.filter(date__gte=date_from)
+    if date_to:
+        qs = qs.filter(date__lte=date_to)
+    return qs
+
+
+def load_series(qs) -> dict[str, np.ndarray]:
+    """
+    Колонки ряда: date — порядковые номера дней, остальные — float64 с NaN вместо NULL.
+    """
+    rows = list(qs.order_by("date", "pk").values_list(*SERIES_FIELDS))
+    columns = {name: [] for name in SERIES_FIELDS}
+    for row in rows:
+        for name, value in zip(SERIES_FIELDS, row):
+            columns[name].append(value)
+    return {
+        "date": np.array([d.toordinal() for d in columns["date"]], dtype=np.int64),
+        **{
+            name: np.array([np.nan if v is None else float(v) for v in columns[name]], dtype=float)
+            for name in SERIES_FIELDS[1:]
+        },
+    }
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Индексы точек, выбранных алгоритмом LTTB (первая и последняя сохраняются).
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # Вершина треугольника в следующем интервале — его среднее
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_lttb(series: dict[str, np.ndarray], points: int) -> dict[str, np.ndarray]:
+    # Точки без рыночной цены на графике цены не отображаются
+    valid = ~np.isnan(series["market_price"])
+    series = {name: column[valid] for name, column in series.items()}
+    idx = lttb_indices(series["date"].astype(float), series["market_price"], points)
+    return {name: column[idx] for name, column in series.items()}
+
+
+def _nan_reduce(func, values: np.ndarray) -> float:
+    values = values[~np.isnan(values)]
+    return float(func(values)) if len(values) else np.nan
+
+
+def downsample_ohlc(series: dict[str, np.ndarray], points: int) -> dict[str, np.ndarray]:
+    dates = series["date"]
+    if not len(dates):
+        return {name: np.array([]) for name in OHLC_FIELDS}
+
+    edges = np.linspace(dates[0], dates[-1] + 1, points + 1)
+    bounds = np.searchsorted(dates, edges)
+    out = {name: [] for name in OHLC_FIELDS}
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if start == end:
+            continue
+        price = series["market_price"][start:end]
+        avg = series["avg_price"][start:end]
+        volume = series["contracts_volume_ei"][start:end]
+        traded = ~np.isnan(price)
+        weighted = ~np.isnan(avg) & ~np.isnan(volume)
+
+        out["date"].append(dates[start])
+        out["open"].append(price[traded][0] if traded.any() else np.nan)
+        out["close"].append(price[traded][-1] if traded.any() else np.nan)
+        out["high"].append(_nan_reduce(np.max, price))
+        out["low"].append(_nan_reduce(np.min, price))
+        out["avg_price"].append(
+            float(np.average(avg[weighted], weights=volume[weighted]))
+            if weighted.any() and volume[weighted].sum() > 0 else _nan_reduce(np.mean, avg)
+        )
+        out["volume_ei"].append(_nan_reduce(np.sum, volume))
+    return {name: np.array(values) for name, values in out.items()}
+
+
+def to_columns(series: dict[str, np.ndarray]) -> dict[str, list]:
+    """
+    Колоночный JSON: даты строками ISO, NaN -> null.
+    """
+    columns = {}
+    for name, column in series.items():
+        if name == "date":
+            columns[name] = [date.fromordinal(int(d)).isoformat() for d in column]
+        else:
+            columns[name] = [None if v != v else round(v, 6) for v in column.tolist()]
+    return columns
+
+
+def build_series(qs, points: int | None = None, method: str = "lttb") -> tuple[str, dict[str, list]]:
+    """
+    Возвращает (применённый метод или "raw", колонки ряда).
+    """
+    series = load_series(qs)
+    if not points or len(series["date"]) <= points:
+        return "raw", to_columns(series)
+    if method == "ohlc":
+        return method, to_columns(downsample_ohlc(series, points))
+    return "lttb", to_columns(downsample_lttb(series, points))
@@ -78,9 +78,30 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Постоянные соединения: PRAGMA выполняются один раз на соединение
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Транзакция сразу берёт блокировку записи: параллельные записи
+            # ждут busy_timeout, а не падают с "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
+# PRAGMA, выполняемые для каждого нового соединения SQLite (см. django_parser/sqlite.py).
+# WAL позволяет читать во время длинной транзакции загрузки; пустой словарь
+# отключает настройку
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'cache_size': -65536,  # 64 МБ
+    'mmap_size': 268435456,  # 256 МБ
+    'temp_store': 'MEMORY',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -117,3 +138,88 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+
+# Загрузка отчётов SPIMEX
+
+SPIMEX_REPORTS_URL = 'https://spimex.com/files/trades/result/upload/reports/oil_xls'
+
+SPIMEX_DOWNLOAD_DIR = BASE_DIR / 'download'
+
+# Архив нормализованных строк отчётов (Parquet по месяцам, нужен pyarrow)
+# для `manage.py reingest_archive`; None — не вести архив
+SPIMEX_ARCHIVE_DIR = BASE_DIR / 'archive'
+
+# Годовые архивы снимков SQLite (см. django_parser/tiers.py); None — не вести
+SNAPSHOT_TIER_DIR = BASE_DIR / 'tiers'
+
+# `manage.py tier_snapshots` переносит в архивы снимки старше стольких дней
+SNAPSHOT_HOT_DAYS = 730
+
+# Максимум параллельных запросов (и размер пула keep-alive соединений)
+SPIMEX_DOWNLOAD_WORKERS = 8
+
+# (connect, read) таймауты одного запроса, секунды
+SPIMEX_DOWNLOAD_TIMEOUT = (5, 30)
+
+SPIMEX_DOWNLOAD_RETRIES = 3
+
+SPIMEX_DOWNLOAD_BACKOFF = 0.5
+
+# Размер пачки INSERT ... ON CONFLICT при записи снимков
+INGEST_BATCH_SIZE = 500
+
+# Фоновые задачи загрузки. Задачи выполняет `manage.py ingest_worker`;
+# при True их разбирает ещё и поток внутри веб-процесса (удобно для runserver).
+INGEST_EMBEDDED_WORKER = True
+
+# Задача без прогресса дольше этого срока (секунды) возвращается в очередь
+INGEST_JOB_STALE_AFTER = 600
+
+# Пагинация списка снимков: "keyset" — по курсору, без OFFSET;
+# "offset" — нумерованные страницы
+SNAPSHOT_PAGINATION = 'keyset'
+
+# Сколько секунд кэшируется COUNT(*) для "Найдено"; ключ содержит версию
+# данных, поэтому после загрузки отчёта счётчик пересчитывается сразу
+SNAPSHOT_COUNT_CACHE_SECONDS = 3600
+
+# Размер пачки строк при потоковой выгрузке (/export/)
+EXPORT_CHUNK_SIZE = 2000
+
+# Кэш страниц списка. LocMemCache — свой в каждом процессе; для нескольких
+# процессов веб-сервера можно указать FileBasedCache с общим каталогом
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'django-parser',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    }
+}
+
+# Сколько секунд хранится готовая страница списка (0 — не кэшировать).
+# Ключ содержит версию данных (DataVersion), которую увеличивает загрузка
+SNAPSHOT_PAGE_CACHE_SECONDS = 600
+
+# Async-представления (ASGI): размер пула потоков для ORM и других
+# блокирующих вызовов. Записи в БД идут отдельно, по одной
+ASYNC_BLOCKING_WORKERS = 8
+
+# Фоновые задачи загрузки через асинхронный конвейер: скачивание, разбор
+# и запись разных дат перекрываются
+INGEST_ASYNC_PIPELINE = True
+
+# Сколько дат асинхронный конвейер обрабатывает одновременно; скачанные,
+# но ещё не записанные отчёты держатся в памяти
+INGEST_ASYNC_INFLIGHT = 16
+
+# Процессов для разбора XLS в асинхронном конвейере; 0 — разбор в пуле
+# потоков ASYNC_BLOCKING_WORKERS
+INGEST_PARSE_PROCESSES = 0
+
+# Матрица инструмент × дата (/api/matrix/): предел числа снимков в выборке
+# (не ячеек матрицы: пропуски и пустые ячейки не считаются) и время
+# хранения готового ответа; ключ содержит версию данных
+MATRIX_MAX_ROWS = 200_000
+
+MATRIX_CACHE_SECONDS = 600
@@ -0,0 +1,19 @@
+"""
+Настройка соединений SQLite из settings.SQLITE_PRAGMAS.
+"""
+from django.conf import settings
+
+
+def pragma_statements(pragmas: dict) -> list[str]:
+    return [f"PRAGMA {name} = {value}" for name, value in pragmas.items()]
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Обработчик сигнала connection_created.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(getattr(settings, "SQLITE_PRAGMAS", {})):
+            cursor.execute(statement)
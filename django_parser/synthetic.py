@@ -0,0 +1,146 @@
+"""
+Синтетические отчёты oil_xls для бенчмарков (`manage.py bench_pipeline`).
+
+Структура листа как у настоящего бюллетеня SPIMEX: шапка, маркер
+"Единица измерения: Метрическая тонна", две строки заголовков, строка
+номеров колонок, блок инструментов, строка "Итого:" и следующий блок
+в килограммах, который разбор должен пропустить. В данных есть прочерки,
+числа текстом с десятичной запятой и пробелами-разделителями тысяч.
+Для записи XLS нужен пакет xlwt (только для бенчмарков).
+"""
+import io
+import os
+import random
+from datetime import date
+
+from .downloader import report_filename
+
+
+PRODUCTS = [
+    ("Бензин (АИ-92-К5)", "A592"),
+    ("Бензин (АИ-95-К5)", "A595"),
+    ("Дизельное топливо ЕВРО, сорт C (ДТ-Л-К5)", "DT5C"),
+    ("Дизельное топливо ЕВРО, межсезонное, сорт F (ДТ-Е-К5)", "DT5F"),
+    ("Топливо для реактивных двигателей (ТС-1)", "TS1Z"),
+    ("Мазут топочный М-100", "M100"),
+]
+
+BASES = [
+    "ст. Таксимо", "ст. Новоярославская", "ст. Комбинатская", "ст. Стенькино II",
+    "ст. Кириши", "ст. Уфа", "ст. Нижнекамск", "ст. Ангарск-группа станций",
+]
+
+HEADERS = [
+    "Код Инструмента", "Наименование Инструмента", "Базис поставки",
+    "Объем Договоров в единицах измерения", "Объем Договоров, руб.",
+    "Изменение рыночной цены к цене предыдущего дня", "",
+    "Цена (за единицу измерения), руб.", "", "", "",
+    "Цена в Заявках (за единицу измерения)", "", "Количество Договоров, шт.",
+]
+SUBHEADERS = [
+    "", "", "", "", "", "Руб.", "%", "Минимальная", "Средневзвешенная", "Максимальная",
+    "Рыночная", "Лучшее предложение", "Лучший спрос", "",
+]
+
+
+def instrument(i: int) -> tuple[str, str, str]:
+    """
+    (код, наименование, базис) i-го инструмента; одинаковы для всех дат.
+    """
+    product, prefix = PRODUCTS[i % len(PRODUCTS)]
+    basis = BASES[(i // len(PRODUCTS)) % len(BASES)]
+    code = f"{prefix}{i // (len(PRODUCTS) * len(BASES)):03d}{(i // len(PRODUCTS)) % len(BASES):02d}F"
+    return code, f"{product}, {basis} (ст. отправления)", basis
+
+
+def as_text(value: float, places: int = 2) -> str:
+    """Число так, как его иногда отдаёт отчёт: "52 000,25"."""
+    return f"{value:,.{places}f}".replace(",", " ").replace(".", ",")
+
+
+def report_rows(d: date, rows: int, seed: int = 0) -> list[list]:
+    """
+    Значения колонок B..O для rows инструментов за дату d.
+    """
+    rnd = random.Random(f"{seed}:{d.isoformat()}")
+    out = []
+    for i in range(rows):
+        code, name, basis = instrument(i)
+        if rnd.random() < 0.15:
+            # Инструмент без сделок: только заявки
+            out.append([code, name, basis, "-", "-", "-", "-", "-", "-", "-", "-",
+                        round(rnd.uniform(40000, 90000), 2), "-", "-"])
+            continue
+        base = 40000 + (i % 500) * 100 + d.toordinal() % 30 * 10
+        low = round(base * rnd.uniform(0.97, 1.0), 2)
+        high = round(base * rnd.uniform(1.0, 1.03), 2)
+        avg = round(rnd.uniform(low, high), 2)
+        market = round(rnd.uniform(low, high), 2)
+        volume = rnd.randrange(60, 6000, 60)
+        change = round(rnd.uniform(-900, 900), 2)
+        values = [
+            code, name, basis,
+            volume, round(volume * avg, 2),
+            change, round(change / market * 100, 2),
+            low, avg, high, market,
+            round(high * 1.01, 2), round(low * 0.99, 2),
+            rnd.randint(1, 40),
+        ]
+        # Часть чисел — текстом, как в выгрузках со сбитым форматом ячеек
+        for col in rnd.sample(range(3, 13), k=2) if rnd.random() < 0.3 else ():
+            values[col] = as_text(values[col])
+        if rnd.random() < 0.05:
+            values[5] = values[6] = "-"
+        out.append(values)
+    return out
+
+
+def report_xls(d: date, rows: int, seed: int = 0) -> bytes:
+    """
+    Книга XLS с отчётом за дату d на rows инструментов.
+    """
+    import xlwt
+
+    wb = xlwt.Workbook(encoding="utf-8")
+    ws = wb.add_sheet("TRADE_SUMMARY")
+    ws.write(1, 1, "Бюллетень по итогам торгов в Секции «Нефтепродукты» АО «Биржа «Санкт-Петербург»")
+    ws.write(3, 1, f"Дата торгов: {d:%d.%m.%Y}")
+    ws.write(5, 1, "Единица измерения: Метрическая тонна")
+    for col, (header, sub) in enumerate(zip(HEADERS, SUBHEADERS), start=1):
+        ws.write(6, col, header)
+        ws.write(7, col, sub)
+        ws.write(8, col, col)
+
+    r = 9
+    data = report_rows(d, rows, seed)
+    for values in data:
+        for col, value in enumerate(values, start=1):
+            ws.write(r, col, value)
+        r += 1
+    ws.write(r, 1, "Итого:")
+    ws.write(r, 5, sum(v[4] for v in data if isinstance(v[4], float)))
+    ws.write(r, 14, sum(v[13] for v in data if isinstance(v[13], int)))
+
+    # Блок в килограммах не входит в разбираемый
+    ws.write(r + 2, 1, "Единица измерения: Килограмм")
+    ws.write(r + 6, 1, "Z000000KGF")
+    ws.write(r + 6, 2, "Битум нефтяной дорожный, ст. Уфа")
+    ws.write(r + 7, 1, "Итого:")
+
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+def write_reports(directory: str, dates, rows: int, seed: int = 0) -> list[str]:
+    """
+    Записывает отчёты за даты в каталог под именами, как на сайте биржи.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for d in dates:
+        path = os.path.join(directory, report_filename(d))
+        with open(path, "wb") as f:
+            f.write(report_xls(d, rows, seed))
+        paths.append(path)
+    return paths
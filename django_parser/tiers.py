@@ -0,0 +1,367 @@
+"""
+Годовые архивы снимков: холодный уровень хранения.
+
+Снимки старше горизонта SNAPSHOT_HOT_DAYS переносятся командой
+`manage.py tier_snapshots` в файлы SQLite SNAPSHOT_TIER_DIR/snapshots_ГГГГ.sqlite3
+с той же таблицей и индексами, поэтому основная база остаётся небольшой.
+
+Чтение (snapshot_queryset):
+  - без date_from или с date_from позже последней архивной даты запрос
+    идёт только в основную таблицу (MarketInstrumentSnapshot): список,
+    выгрузка и ряды по умолчанию показывают горячие данные;
+  - если date_from заходит в архив — в TieredSnapshot — временное представление snapshot_tiered,
+    UNION ALL основной таблицы и таблиц присоединённых (ATTACH) архивов.
+    SQLite проталкивает условия WHERE в каждую ветку, а ORDER BY ... LIMIT
+    выполняет слиянием веток по индексам, поэтому архив вне диапазона дат
+    стоит одного поиска по индексу.
+Архивы присоединяются к соединению при первом запросе к представлению
+и заново, когда меняется набор файлов. SQLite присоединяет не больше
+10 баз (SQLITE_MAX_ATTACHED), одна из них нужна переносу, поэтому архивов
+не больше MAX_TIER_FILES: tier_snapshots не создаёт лишний файл, а если
+файлов всё же больше (положены вручную), присоединяются последние
+MAX_TIER_FILES лет и `manage.py check` предупреждает об этом.
+
+Перед повторной загрузкой архивной даты её снимки возвращаются в основную
+таблицу с прежними id (restore_dates), поэтому загрузка сравнивает строки
+отчёта с ними, как с обычными; следующий запуск tier_snapshots переносит
+их обратно. Связи с товарами в архив не переносятся: для архива фильтр по товару — вхождение названия
+в product, по тому же правилу строятся связи (products.py). Агрегаты
+SnapshotRollup остаются в основной базе за все годы. Миграция, меняющая
+таблицу снимков, должна так же изменить таблицы архивов.
+"""
+import os
+import re
+import sqlite3
+from contextlib import closing
+from datetime import date, timedelta
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import checks
+from django.db import connection, transaction
+
+from .dataversion import bump_data_version
+from .models import MarketInstrumentSnapshot, SnapshotProduct, TieredSnapshot
+from .products import link_products
+from .revisions import snapshot_hash
+
+
+TIERED_TABLE = TieredSnapshot._meta.db_table
+TIER_FILE_RE = re.compile(r"^snapshots_(\d{4})\.sqlite3$")
+# Схема, под которой архив присоединяется на время переноса
+MOVE_SCHEMA = "tier_move"
+# SQLITE_MAX_ATTACHED без места для MOVE_SCHEMA
+MAX_TIER_FILES = 9
+
+
+class TierError(Exception):
+    """Снимки не удалось перенести в архив."""
+
+
+def tier_dir() -> str | None:
+    path = getattr(settings, "SNAPSHOT_TIER_DIR", None)
+    return str(path) if path else None
+
+
+def tier_path(year: int, root: str | None = None) -> str:
+    return os.path.join(root or tier_dir(), f"snapshots_{year}.sqlite3")
+
+
+def tier_files(root: str | None = None) -> dict[int, str]:
+    """
+    Все архивы каталога по годам (по возрастанию).
+    """
+    root = root or tier_dir()
+    if not root or not os.path.isdir(root):
+        return {}
+    files = {}
+    for name in os.listdir(root):
+        match = TIER_FILE_RE.match(name)
+        if match:
+            files[int(match.group(1))] = os.path.join(root, name)
+    return dict(sorted(files.items()))
+
+
+def attachable_files(root: str | None = None) -> dict[int, str]:
+    """
+    Архивы, которые присоединяются к соединению: последние MAX_TIER_FILES лет.
+    """
+    files = tier_files(root)
+    return dict(list(files.items())[-MAX_TIER_FILES:])
+
+
+def check_tier_limit(years, root: str | None = None):
+    """
+    TierError, если перенос годов years дал бы больше MAX_TIER_FILES архивов.
+    """
+    total = set(tier_files(root)) | set(years)
+    if len(total) > MAX_TIER_FILES:
+        raise TierError(
+            f"Перенос дал бы {len(total)} годовых архивов, а SQLite присоединяет не больше "
+            f"{MAX_TIER_FILES}: уменьшите число лет (--before) или увеличьте SNAPSHOT_HOT_DAYS"
+        )
+
+
+@checks.register()
+def check_tier_files(app_configs, **kwargs):
+    files = tier_files()
+    if len(files) <= MAX_TIER_FILES:
+        return []
+    skipped = ", ".join(str(year) for year in list(files)[:-MAX_TIER_FILES])
+    return [checks.Warning(
+        f"Годовых архивов {len(files)}, присоединяются только последние {MAX_TIER_FILES}; "
+        f"снимки за {skipped} не видны в списке, выгрузке и рядах",
+        id="django_parser.W001",
+    )]
+
+
+def _schema(year: int) -> str:
+    return f"tier_{year}"
+
+
+def _quote(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+def _columns() -> str:
+    # Колонки, общие для основной таблицы и архивов любого возраста
+    return ", ".join(_quote(f.column) for f in TieredSnapshot._meta.concrete_fields)
+
+
+# (путь, mtime) последнего архива -> его последняя дата
+_archived_until = (None, None)
+
+
+def archived_until() -> date | None:
+    """
+    Последняя дата в архивах или None, если архивов нет.
+    """
+    global _archived_until
+    files = tier_files()
+    if not files:
+        return None
+    path = files[max(files)]
+    key = (path, os.stat(path).st_mtime_ns)
+    if _archived_until[0] != key:
+        with closing(sqlite3.connect(f"file:{quote(path)}?mode=ro", uri=True)) as db:
+            value = db.execute(
+                f"SELECT MAX(date) FROM {_quote(MarketInstrumentSnapshot._meta.db_table)}"
+            ).fetchone()[0]
+        _archived_until = (key, date.fromisoformat(value) if value else None)
+    return _archived_until[1]
+
+
+def snapshot_queryset(date_from: date | None = None):
+    """
+    Снимки для запроса с нижней границей дат date_from: вместе с архивами,
+    только если date_from явно задана и заходит в архив, иначе основная таблица.
+    """
+    if date_from is None:
+        return MarketInstrumentSnapshot.objects.all()
+    until = archived_until()
+    if until is None or date_from > until:
+        return MarketInstrumentSnapshot.objects.all()
+    return TieredSnapshot.objects.all()
+
+
+# Присоединение архивов к соединениям
+
+def tiered_view_sql(years) -> str:
+    table = _quote(MarketInstrumentSnapshot._meta.db_table)
+    columns = _columns()
+    selects = [f"SELECT {columns} FROM main.{table}"]
+    selects += [f"SELECT {columns} FROM {_schema(year)}.{table}" for year in years]
+    return f"CREATE TEMP VIEW {_quote(TIERED_TABLE)} AS " + " UNION ALL ".join(selects)
+
+
+class TierAttacher:
+    """
+    execute wrapper соединения: перед запросом к snapshot_tiered присоединяет
+    архивы и пересоздаёт представление, если набор файлов изменился.
+    Внутри транзакции ATTACH невозможен, тогда используется прежний набор.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.attached = None
+
+    def reset(self):
+        self.attached = None
+
+    def __call__(self, execute, sql, params, many, context):
+        if TIERED_TABLE in sql and not self.db.connection.in_transaction:
+            files = attachable_files()
+            if files != self.attached:
+                self.refresh(files)
+        return execute(sql, params, many, context)
+
+    def refresh(self, files: dict[int, str]):
+        raw = self.db.connection
+        attached = self.attached or {}
+        for year, path in attached.items():
+            if files.get(year) != path:
+                raw.execute(f"DETACH DATABASE {_schema(year)}")
+        for year, path in files.items():
+            if attached.get(year) != path:
+                raw.execute(f"ATTACH DATABASE ? AS {_schema(year)}", [path])
+        raw.execute(f"DROP VIEW IF EXISTS temp.{_quote(TIERED_TABLE)}")
+        raw.execute(tiered_view_sql(files))
+        self.attached = files
+
+
+def install_tier_attacher(sender, connection, **kwargs):
+    """
+    Обработчик сигнала connection_created.
+    """
+    if connection.vendor != "sqlite":
+        return
+    for wrapper in connection.execute_wrappers:
+        if isinstance(wrapper, TierAttacher):
+            # Новое соединение того же DatabaseWrapper: ничего не присоединено
+            wrapper.reset()
+            return
+    # В начало списка: execute_wrapper() снимает с конца свою обёртку,
+    # даже если соединение открылось внутри него
+    connection.execute_wrappers.insert(0, TierAttacher(connection))
+
+
+# Перенос в архив
+
+def default_horizon() -> date:
+    return date.today() - timedelta(days=getattr(settings, "SNAPSHOT_HOT_DAYS", 730))
+
+
+def years_to_move(before: date) -> dict[int, int]:
+    """
+    Год -> число снимков основной таблицы раньше даты before.
+    """
+    counts = {}
+    for d in MarketInstrumentSnapshot.objects.filter(date__lt=before).dates("date", "year"):
+        start, end = d, min(date(d.year, 12, 31), before - timedelta(days=1))
+        counts[d.year] = MarketInstrumentSnapshot.objects.filter(date__range=(start, end)).count()
+    return counts
+
+
+def create_tier_file(path: str):
+    """
+    Создаёт архив с таблицей снимков и индексами как в основной базе.
+    Файл собирается под временным именем, поэтому соединения не увидят
+    архив без таблицы.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = %s AND sql IS NOT NULL ORDER BY type = 'index'",
+            [MarketInstrumentSnapshot._meta.db_table],
+        )
+        statements = [row[0] for row in cursor.fetchall()]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp)
+    try:
+        with db:
+            for statement in statements:
+                db.execute(statement)
+    finally:
+        db.close()
+    os.replace(tmp, path)
+
+
+def move_year(year: int, before: date, root: str | None = None) -> int:
+    """
+    Переносит снимки года раньше before в архив года. Строки сначала
+    копируются (одноимённые архивные заменяются) и проверяются по id,
+    затем отдельной транзакцией удаляются из основной таблицы: при сбое
+    между шагами строки остаются в обоих местах, но не теряются.
+    Возвращает число перенесённых снимков.
+    """
+    start, end = date(year, 1, 1), min(date(year, 12, 31), before - timedelta(days=1))
+    path = tier_path(year, root)
+    if not os.path.exists(path):
+        create_tier_file(path)
+
+    table = _quote(MarketInstrumentSnapshot._meta.db_table)
+    columns = _columns()
+    in_range = "date BETWEEN %s AND %s"
+    with connection.cursor() as cursor:
+        cursor.execute(f"ATTACH DATABASE %s AS {MOVE_SCHEMA}", [path])
+        try:
+            with transaction.atomic():
+                cursor.execute(
+                    f"INSERT OR REPLACE INTO {MOVE_SCHEMA}.{table} ({columns}) "
+                    f"SELECT {columns} FROM main.{table} WHERE {in_range}",
+                    [start, end],
+                )
+            cursor.execute(
+                f"SELECT COUNT(*) FROM main.{table} AS m WHERE {in_range} AND NOT EXISTS "
+                f"(SELECT 1 FROM {MOVE_SCHEMA}.{table} AS a WHERE a.id = m.id)",
+                [start, end],
+            )
+            missing = cursor.fetchone()[0]
+            if missing:
+                raise TierError(f"{missing} снимков {year} года не скопированы в {path}")
+            with transaction.atomic():
+                SnapshotProduct.objects.filter(snapshot__date__range=(start, end)).delete()
+                cursor.execute(f"DELETE FROM main.{table} WHERE {in_range}", [start, end])
+                moved = cursor.rowcount
+                bump_data_version()
+        finally:
+            cursor.execute(f"DETACH DATABASE {MOVE_SCHEMA}")
+    return moved
+
+
+# Возврат из архива
+
+def restore_dates(dates) -> int:
+    """
+    Возвращает в основную таблицу архивные снимки дат dates с прежними id,
+    хэшами значений и связями с товарами. Из архива строки удаляются после
+    фиксации транзакции: при сбое они остаются в обоих местах, и следующий
+    перенос заменит архивные. Строки, ключ которых уже есть в основной
+    таблице, не возвращаются. Возвращает число прочитанных из архива строк.
+    """
+    until = archived_until()
+    if until is None:
+        return 0
+    by_year = {}
+    for d in dates:
+        if d <= until:
+            by_year.setdefault(d.year, set()).add(d)
+    files = tier_files()
+    table = _quote(MarketInstrumentSnapshot._meta.db_table)
+    columns = _columns()
+    placeholders = ", ".join(["%s"] * len(TieredSnapshot._meta.concrete_fields))
+
+    restored = 0
+    for year, year_dates in sorted(by_year.items()):
+        path = files.get(year)
+        if path is None:
+            continue
+        days = sorted(d.isoformat() for d in year_dates)
+        in_days = f"date IN ({', '.join('?' * len(days))})"
+        with closing(sqlite3.connect(f"file:{quote(path)}?mode=ro", uri=True)) as db:
+            rows = db.execute(f"SELECT {columns} FROM {table} WHERE {in_days}", days).fetchall()
+        if not rows:
+            continue
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT OR IGNORE INTO main.{table} ({columns}) VALUES ({placeholders})", rows
+                )
+            snapshots = MarketInstrumentSnapshot.objects.filter(date__in=year_dates)
+            unhashed = list(snapshots.filter(content_hash__isnull=True))
+            for obj in unhashed:
+                obj.content_hash = snapshot_hash(obj)
+            MarketInstrumentSnapshot.objects.bulk_update(unhashed, ["content_hash"], batch_size=500)
+            link_products(snapshots)
+            transaction.on_commit(lambda path=path, days=days, in_days=in_days: _delete_archived(
+                path, f"DELETE FROM {table} WHERE {in_days}", days
+            ))
+        restored += len(rows)
+    return restored
+
+
+def _delete_archived(path: str, sql: str, params: list):
+    with closing(sqlite3.connect(path, timeout=30)) as db, db:
+        db.execute(sql, params)
@@ -16,11 +16,21 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from django_parser.views import parser, SnapshotListView, ProductCreateView
+from django_parser.views import (
+    parser, parser_job, instrument_search, trends, series, prometheus_metrics, snapshot_list,
+    SnapshotExportView, SnapshotMatrixView, ProductCreateView,
+)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('parser/', parser, name='parser'),
-    path('', SnapshotListView.as_view(), name='home'),
+    path('parser/jobs/<int:pk>/', parser_job, name='parser_job'),
+    path('instruments/search/', instrument_search, name='instrument_search'),
+    path('api/trends/', trends, name='trends'),
+    path('api/series/<str:code>/', series, name='series'),
+    path('export/', SnapshotExportView.as_view(), name='export'),
+    path('api/matrix/', SnapshotMatrixView.as_view(), name='matrix'),
+    path('metrics', prometheus_metrics, name='metrics'),
+    path('', snapshot_list, name='home'),
     path('add_product', ProductCreateView.as_view(), name='add_product'),
 ]
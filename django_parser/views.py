@@ -1,183 +1,214 @@
-import os
-from decimal import Decimal, InvalidOperation
-from itertools import product
-
-import requests
-from django.db import transaction
-from django.shortcuts import render, redirect
-import pandas as pd
+import hashlib
+import json
+import time
 from datetime import date, timedelta
-from django.urls import reverse_lazy
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max
+from django.http import FileResponse, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag, urlencode
 from django.views.generic import CreateView
-from .models import Products
+from . import metrics
+from .aio import aread_file, run_blocking, run_write
+from .dataversion import current_data_version
+from .export import (
+    ExportDependencyError, astream_csv, astream_parquet, stream_csv, stream_parquet, write_xlsx,
+)
+from .instruments import matching_instruments, search_instruments
+from .jobs import enqueue_ingest, ensure_embedded_worker
+from .matrix import CHANGE_MODES, MATRIX_METRICS, MatrixTooLarge, build_matrix
+from .models import IngestJob, Products, SnapshotProduct, SnapshotRollup
+from .pagination import CachedCountPaginator, KeysetPaginator
+from .products import relink_product
+from .rollups import period_start
+from .series import DOWNSAMPLE_METHODS, build_series, series_queryset
+from .tiers import snapshot_queryset
 from .forms import ProductCreateForm,SnapshotFilterForm
 from django.views.generic import ListView
 
 
 from django_parser.models import MarketInstrumentSnapshot
 
+SERIES_DEFAULT_POINTS = 1000
+SERIES_MAX_POINTS = 10000
+MATRIX_MAX_WINDOW = 250
+
 
-def generate_dates(days: int = 10, direction: str = "past", start: date | None = None):
+def query_digest(request, data_version, *ignore: str) -> str:
     """
-    Генерирует даты, начиная со start (по умолчанию сегодня), включая start и days.
+    Ключ ответа: версия данных и отсортированные непустые параметры запроса
+    (кроме ignore), поэтому порядок параметров не влияет на попадание в кэш.
     """
-
-    start = date.today()
-
-    step = -1 if direction == "past" else 1
-    for i in range(days + 1):
-        yield start + timedelta(days=step * i)
-
-def build_ts(d) -> str:
-    return f"{d:%Y%m%d}"
-
-
-def find_row_index_by_marker_xls(
-    xls_path: str,
-    marker: str = "Единица измерения: Метрическая тонна".lower(),
-    sheet: int | str = 0,
-    column: str = "B",
-    start_index: int = 0,
-    contains: bool = False,
-) -> int | None:
-
-    col_idx = ord(column.upper()) - ord("A")
-
-    df = pd.read_excel(xls_path, sheet_name=sheet, header=None, engine="xlrd")
-
-    # Берём нужную колонку, приводим к строке и lower()
-    s = (
-        df.iloc[start_index:, col_idx]
-        .astype(str)
-        .str.strip()
-        .str.lower()
+    query = sorted(
+        (key, value) for key, values in request.GET.lists()
+        for value in values if value != "" and key not in ignore
     )
+    return hashlib.sha1(f"{data_version.version}|{urlencode(query)}".encode()).hexdigest()
 
-    m = marker.strip().lower()
-    matches = s.str.contains(m, na=False) if contains else (s == m)
-    if matches.any():
-        return int(matches.idxmax())  # индекс первой найденной строки
-    return None
 
-def dash_to_none(v: any):
-    if v is None:
-        return None
-    if isinstance(v, str):
-        s = v.strip()
-        if s in {"-", ""}:
-            return None
-        return s
-    return v
+# Представления async: ORM и прочие блокирующие вызовы выполняются в пуле
+# потоков (aio.run_blocking), поэтому под ASGI один процесс обслуживает
+# запросы параллельно, в том числе во время загрузки отчётов.
 
+async def parser(request):
+    """
+    Ставит обновление за последние 10 дней в очередь и сразу возвращает ответ.
+    Повторный клик во время выполнения не создаёт вторую задачу.
+    """
+    date_to = date.today()
+    job, created = await run_write(enqueue_ingest, date_to - timedelta(days=10), date_to)
+    ensure_embedded_worker()
+
+    status_url = reverse('parser_job', args=[job.pk])
+    if created:
+        messages.info(request, f'Обновление поставлено в очередь: {status_url}')
+    else:
+        messages.info(request, f'Обновление уже выполняется: {status_url}')
+    return redirect(reverse_lazy('home'))
 
-def to_decimal(v: any):
-    v = dash_to_none(v)
-    if v is None:
-        return None
-    if isinstance(v, Decimal):
-        return v
-    if isinstance(v, (int, float)):
-        return Decimal(str(v))
 
-    s = str(v).strip()
-    s = s.replace(" ", "").replace(",", ".")
+async def instrument_search(request):
+    """
+    Поиск инструментов для фильтра по мере ввода: ?q=часть кода или наименования.
+    """
+    results = await run_blocking(search_instruments, request.GET.get("q", ""))
+    return JsonResponse({"results": [{"code": code, "label": label} for code, label in results]})
+
+
+def _trend_points(rollups) -> list[dict]:
+    return [
+        {
+            "period_start": r.period_start,
+            "vwap": r.vwap,
+            "min_price": r.min_price,
+            "max_price": r.max_price,
+            "volume_rub": r.volume_rub,
+            "volume_ei": r.volume_ei,
+            "contracts_count": r.contracts_count,
+        }
+        for r in rollups.order_by("period_start")
+    ]
+
+
+async def trends(request):
+    """
+    Динамика по агрегатам SnapshotRollup:
+    ?key=код инструмента или товар&dimension=instrument|product
+    &period=day|week|month&date_from=ГГГГ-ММ-ДД&date_to=ГГГГ-ММ-ДД
+    """
+    key = request.GET.get("key")
+    dimension = request.GET.get("dimension") or SnapshotRollup.Dimension.INSTRUMENT
+    period = request.GET.get("period") or SnapshotRollup.Period.WEEK
+    if not key:
+        return JsonResponse({"error": "не задан key"}, status=400)
+    if dimension not in SnapshotRollup.Dimension.values or period not in SnapshotRollup.Period.values:
+        return JsonResponse({"error": "некорректные dimension или period"}, status=400)
     try:
-        return Decimal(s)
-    except (InvalidOperation, ValueError) as e:
-        raise ValueError(f"Некорректное decimal значение: {v!r}") from e
-
-
-def to_int(v: any):
-    v = dash_to_none(v)
-    if v is None:
-        return None
-    if isinstance(v, int):
-        return v
-    s = str(v).strip().replace(" ", "")
+        date_from = date.fromisoformat(request.GET["date_from"]) if request.GET.get("date_from") else None
+        date_to = date.fromisoformat(request.GET["date_to"]) if request.GET.get("date_to") else None
+    except ValueError:
+        return JsonResponse({"error": "даты в формате ГГГГ-ММ-ДД"}, status=400)
+
+    rollups = SnapshotRollup.objects.filter(period=period, dimension=dimension, key=key)
+    if date_from:
+        rollups = rollups.filter(period_start__gte=period_start(period, date_from))
+    if date_to:
+        rollups = rollups.filter(period_start__lte=date_to)
+
+    return JsonResponse({
+        "key": key,
+        "dimension": dimension,
+        "period": period,
+        "points": await run_blocking(_trend_points, rollups),
+    })
+
+
+def _series_params(request):
     try:
-        return int(s)
-    except ValueError as e:
-        raise ValueError(f"Некорректное int значение: {v!r}") from e
+        date_from = date.fromisoformat(request.GET["date_from"]) if request.GET.get("date_from") else None
+        date_to = date.fromisoformat(request.GET["date_to"]) if request.GET.get("date_to") else None
+        points = int(request.GET.get("points") or SERIES_DEFAULT_POINTS)
+    except ValueError:
+        return None
+    method = request.GET.get("method") or "lttb"
+    if method not in DOWNSAMPLE_METHODS or points < 3:
+        return None
+    return date_from, date_to, min(points, SERIES_MAX_POINTS), method
 
 
+def _series_etag(request, code):
+    """
+    Ряд определяется параметрами запроса, числом строк, последней датой
+    в диапазоне и версией данных: повторная загрузка может исправить
+    прошлые точки, не меняя ни числа строк, ни последней даты.
+    """
+    params = _series_params(request)
+    if params is None:
+        return None
+    state = series_queryset(code, *params[:2]).aggregate(n=Count("pk"), last=Max("date"))
+    key = f"{code}|{params}|{state['n']}|{state['last']}|{current_data_version().version}"
+    return hashlib.sha1(key.encode()).hexdigest()
 
-@transaction.atomic
-def upsert_snapshot(row: dict[str, any], date_create):
-    row = row[1]
-    instrument_code = row[1]
-    instrument_name = row[2]
-    dt = date_create
 
-    if not instrument_code or not instrument_name or dt is None:
-        raise ValueError(
-            "Обязательные поля instrument_code, instrument_name, date должны быть заданы"
+async def series(request, code):
+    """
+    Ряд инструмента в колоночном JSON:
+    ?date_from=&date_to=&points=число точек&method=lttb|ohlc
+    Ответ перепроверяется по ETag (304 без чтения ряда).
+    """
+    params = _series_params(request)
+    if params is None:
+        return JsonResponse({"error": "некорректные date_from, date_to, points или method"}, status=400)
+    etag = quote_etag(await run_blocking(_series_etag, request, code))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        date_from, date_to, points, method = params
+        applied, columns = await run_blocking(
+            build_series, series_queryset(code, date_from, date_to), points, method
         )
+        response = JsonResponse({"code": code, "method": applied, **columns})
+    response["ETag"] = etag
+    return response
 
-    product_name = row[2].split(",")[0]
-
-    defaults = {
-        "delivery_basis": dash_to_none(row[3]),
-        "contracts_volume_ei": to_decimal(row[4]),
-        "contracts_volume_rub": to_decimal(row[5]),
-        "market_change_rub": to_decimal(row[6]),
-        "market_change_pct": to_decimal(row[7]),
-        "min_price": to_decimal(row[8]),
-        "avg_price": to_decimal(row[9]),
-        "max_price": to_decimal(row[10]),
-        "market_price": to_decimal(row[11]),
-        "best_offer": to_decimal(row[12]),
-        "best_bid": to_decimal(row[13]),
-        "contracts_count": to_int(row[14]),
-        "product": product_name,
-    }
-
-    obj, created = MarketInstrumentSnapshot.objects.update_or_create(
-        instrument_code=instrument_code,
-        instrument_name=instrument_name,
-        date=dt,
-        defaults=defaults,
-    )
-    return obj, created
-
-
-def parser(request):
-
-    dates = generate_dates(10)
-    for d in dates:
-        date_formated = build_ts(d)
-        r = requests.get(f'https://spimex.com/files/trades/result/upload/reports/oil_xls/oil_xls_{date_formated}162000.xls')
-        if r.status_code == 200:
-            print(f'{r.status_code}: {d}: файл получен')
-            os.makedirs('download', exist_ok=True)
-            filename = f"oil_xls_{date_formated}162000.xls"
-            out_path = os.path.join('download', filename)
-
-            with open(out_path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=1024 * 256):
-                    if chunk:
-                        f.write(chunk)
-
-            start_parse_index = find_row_index_by_marker_xls(out_path) + 4
-            end_parse_index = find_row_index_by_marker_xls(out_path,
-                                                           marker='Итого:'.lower(),
-                                                           start_index=start_parse_index)
-            print(f'{start_parse_index} {end_parse_index}')
 
+async def prometheus_metrics(request):
+    """
+    Метрики процесса в текстовом формате Prometheus.
+    """
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
-            df = pd.read_excel(out_path, sheet_name=0, header=None, engine="xlrd")
-            selected_data = df.iloc[start_parse_index:end_parse_index]
 
-            for row in selected_data.iterrows():
-                snapshot, created = upsert_snapshot(row, d)
-        else:
-            print(f'{r.status_code}: {d}')
-    return redirect(reverse_lazy('home'))
+async def parser_job(request, pk):
+    """
+    Состояние задачи загрузки с прогрессом по датам.
+    """
+    job = await run_blocking(get_object_or_404, IngestJob, pk=pk)
+    return JsonResponse({
+        "id": job.pk,
+        "status": job.status,
+        "date_from": job.date_from,
+        "date_to": job.date_to,
+        "progress": job.progress,
+        "stats": job.stats,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }, json_dumps_params={"ensure_ascii": False})
 
 class SnapshotListView(ListView):
     model = MarketInstrumentSnapshot
     template_name = "main_page.html"
     context_object_name = "rows"
     paginate_by = 50
+    paginator_class = CachedCountPaginator
 
 
     def get_attr_name_by_rus_name(self, sort_name_rus, prefix):
@@ -212,28 +243,37 @@ class SnapshotListView(ListView):
             return f"date"
 
     def get_queryset(self):
-        qs = MarketInstrumentSnapshot.objects.all()
-
         self.filter_form = SnapshotFilterForm(self.request.GET or None)
-        if self.filter_form.is_valid():
-            cd = self.filter_form.cleaned_data
-
-            if cd.get("date_from"):
-                qs = qs.filter(date__gte=cd["date_from"])
-            if cd.get("date_to"):
-                qs = qs.filter(date__lte=cd["date_to"])
-
-            if cd.get("instrument_codes"):
-                qs = qs.filter(instrument_code__in=cd["instrument_codes"])
-
-            if cd.get("product"):
+        cd = self.filter_form.cleaned_data if self.filter_form.is_valid() else {}
+        # Годовые архивы читаются, только если диапазон дат заходит в них
+        qs = snapshot_queryset(cd.get("date_from"))
+
+        if cd.get("date_from"):
+            qs = qs.filter(date__gte=cd["date_from"])
+        if cd.get("date_to"):
+            qs = qs.filter(date__lte=cd["date_to"])
+
+        if cd.get("instrument_codes"):
+            qs = qs.filter(instrument_code__in=cd["instrument_codes"])
+
+        # Полнотекстовый поиск по справочнику инструментов,
+        # снимки отбираются по индексу instrument_code
+        if cd.get("q"):
+            qs = qs.filter(instrument_code__in=matching_instruments(cd["q"]).values("code"))
+
+        if cd.get("product"):
+            if qs.model is MarketInstrumentSnapshot:
+                linked = SnapshotProduct.objects.filter(product__name=cd["product"])
+                qs = qs.filter(pk__in=linked.values("snapshot_id"))
+            else:
+                # Связи с товарами есть только у основной таблицы
                 qs = qs.filter(product__contains=cd["product"])
 
-            # Диапазон по рыночной цене (market_price)
-            if cd.get("price_from") is not None:
-                qs = qs.filter(market_price__isnull=False, market_price__gte=cd["price_from"])
-            if cd.get("price_to") is not None:
-                qs = qs.filter(market_price__isnull=False, market_price__lte=cd["price_to"])
+        # Диапазон по рыночной цене (market_price)
+        if cd.get("price_from") is not None:
+            qs = qs.filter(market_price__isnull=False, market_price__gte=cd["price_from"])
+        if cd.get("price_to") is not None:
+            qs = qs.filter(market_price__isnull=False, market_price__lte=cd["price_to"])
 
         # Сортировка
         sort = self.request.GET.get("sort") or "date"
@@ -243,14 +283,66 @@ class SnapshotListView(ListView):
 
         prefix = "-" if direction == "max" else ""
         sort_name = self.get_attr_name_by_rus_name(sort, prefix)
-        qs = qs.order_by(sort_name, "instrument_code")
+        # Ключ-разрыв в том же направлении, что и сортировка: тогда ORDER BY
+        # целиком обслуживается одним индексом (sort_name, instrument_code)
+        tie_breaker = "date" if sort_name.lstrip("-") == "instrument_code" else "instrument_code"
+        if sort_name.startswith("-"):
+            tie_breaker = "-" + tie_breaker
+        self.ordering_fields = [sort_name, tie_breaker]
+        qs = qs.order_by(*self.ordering_fields)
 
         self.current_sort = sort
         self.current_dir = direction
         return qs
 
+    def get(self, request, *args, **kwargs):
+        """
+        Готовая страница берётся из кэша по нормализованной строке запроса
+        и версии данных; браузер перепроверяет её по ETag/Last-Modified.
+        Страницы с сообщениями пользователю не кэшируются.
+        """
+        timeout = getattr(settings, "SNAPSHOT_PAGE_CACHE_SECONDS", 0)
+        if not timeout or len(messages.get_messages(request)):
+            return super().get(request, *args, **kwargs)
+
+        data_version = current_data_version()
+        digest = query_digest(request, data_version)
+        etag = f'"{digest}"'
+        last_modified = data_version.updated_at.timestamp() if data_version.updated_at else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            key = f"snapshot_page:{digest}"
+            content = cache.get(key)
+            if content is None:
+                response = super().get(request, *args, **kwargs)
+                response.render()
+                if response.status_code == 200:
+                    cache.set(key, response.content, timeout)
+            else:
+                response = HttpResponse(content)
+
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        В режиме SNAPSHOT_PAGINATION = "keyset" страницы выбираются по курсору
+        (?cursor=...), без OFFSET; иначе — обычная нумерованная пагинация.
+        """
+        if getattr(settings, "SNAPSHOT_PAGINATION", "offset") != "keyset":
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size, self.ordering_fields)
+        page = paginator.page(self.request.GET.get("cursor"))
+        return paginator, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
+        ctx["keyset"] = isinstance(ctx["paginator"], KeysetPaginator)
+        ctx["total_count"] = ctx["paginator"].count() if ctx["keyset"] else ctx["paginator"].count
         ctx["labels"] = ["КодИнструмента", "НаименованиеИнструмента", "БазисПоставки", "ОбъемДоговоровЕИ",
                          "ОбъемДоговоровРуб", "ИзмРынРуб", "ИзмРынПроц", "МинЦена", "СреднЦена", "МаксЦена",
                          "РынЦена", "ЛучшПредложение", "ЛучшСпрос", "КоличествоДоговоров", "Дата", "Товар"]
@@ -261,11 +353,118 @@ class SnapshotListView(ListView):
 
 
 
+def _render_snapshot_list(request):
+    started = time.perf_counter()
+    with metrics.count_queries() as queries:
+        response = SnapshotListView.as_view()(request)
+        if hasattr(response, "render"):
+            response.render()
+    metrics.view_seconds.observe(time.perf_counter() - started, view="snapshot_list")
+    metrics.view_queries.observe(queries[0], view="snapshot_list")
+    metrics.view_responses.inc(view="snapshot_list", status=response.status_code)
+    return response
+
+
+async def snapshot_list(request):
+    """
+    Список снимков (SnapshotListView) с выполнением и отрисовкой в пуле потоков.
+    """
+    return await run_blocking(_render_snapshot_list, request)
+
+
+class SnapshotExportView(SnapshotListView):
+    """
+    Выгрузка всех строк списка с теми же фильтрами и сортировкой:
+    ?<фильтры>&format=csv|parquet|xlsx
+
+    Под ASGI CSV и Parquet читаются пачками по ключу сортировки, каждая
+    пачка — отдельный запрос в пуле потоков. Под WSGI асинхронный итератор
+    был бы целиком собран в память до отправки, поэтому там отдаётся
+    обычный генератор с серверным курсором. XLSX собирается во временном
+    файле в пуле потоков и отдаётся по кускам.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        fmt = request.GET.get("format") or "csv"
+        qs = await run_blocking(self.get_queryset)
+        filename = f"snapshots_{date.today():%Y%m%d}.{fmt}"
+        is_asgi = isinstance(request, ASGIRequest)
+        # pk в том же направлении, что и у KeysetPaginator в astream_*:
+        # строки с равными ключами сортировки идут одинаково при любом обработчике
+        pk = "-pk" if self.ordering_fields[-1].startswith("-") else "pk"
+        ordered = qs.order_by(*self.ordering_fields, pk)
+
+        try:
+            if fmt == "csv":
+                stream = astream_csv(qs, self.ordering_fields) if is_asgi else stream_csv(ordered)
+                response = StreamingHttpResponse(stream, content_type="text/csv; charset=utf-8")
+            elif fmt == "parquet":
+                stream = astream_parquet(qs, self.ordering_fields) if is_asgi else stream_parquet(ordered)
+                response = StreamingHttpResponse(stream, content_type="application/vnd.apache.parquet")
+            elif fmt == "xlsx":
+                f = await run_blocking(write_xlsx, ordered)
+                content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                if is_asgi:
+                    response = StreamingHttpResponse(aread_file(f), content_type=content_type)
+                else:
+                    response = FileResponse(f, content_type=content_type)
+            else:
+                return HttpResponseBadRequest(f"Неизвестный формат выгрузки: {fmt}")
+        except ExportDependencyError as e:
+            return HttpResponse(str(e), status=501)
+
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class SnapshotMatrixView(SnapshotListView):
+    """
+    Матрица инструмент × дата по показателю для строк списка с теми же фильтрами:
+    ?<фильтры>&metric=market_price&change=abs|pct&rolling=число дат
+    Ответ кэшируется по версии данных и параметрам запроса.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        metric = request.GET.get("metric") or "market_price"
+        change_mode = request.GET.get("change") or None
+        try:
+            window = int(request.GET.get("rolling") or 0) or None
+        except ValueError:
+            window = -1
+        if metric not in MATRIX_METRICS:
+            return JsonResponse({"error": f"metric: одно из {', '.join(MATRIX_METRICS)}"}, status=400)
+        if change_mode not in (None, *CHANGE_MODES) or (window is not None and not 2 <= window <= MATRIX_MAX_WINDOW):
+            return JsonResponse(
+                {"error": f"change: abs или pct; rolling: от 2 до {MATRIX_MAX_WINDOW}"}, status=400
+            )
+        try:
+            content = await run_blocking(self.matrix_content, metric, change_mode, window)
+        except MatrixTooLarge as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return HttpResponse(content, content_type="application/json")
+
+    def matrix_content(self, metric: str, change_mode: str | None, window: int | None) -> bytes:
+        # Сортировка и курсор списка на матрицу не влияют
+        key = f"snapshot_matrix:{query_digest(self.request, current_data_version(), 'sort', 'dir', 'cursor', 'page')}"
+        content = cache.get(key)
+        if content is None:
+            matrix = build_matrix(self.get_queryset(), metric, change_mode, window,
+                                  limit=getattr(settings, "MATRIX_MAX_ROWS", 200_000))
+            content = json.dumps(matrix, cls=DjangoJSONEncoder, ensure_ascii=False).encode()
+            cache.set(key, content, getattr(settings, "MATRIX_CACHE_SECONDS", 600))
+        return content
+
+
 class ProductCreateView(CreateView):
     model = Products
     form_class = ProductCreateForm
     template_name = "add_product.html"
     success_url = reverse_lazy("add_product")
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        relink_product(self.object)
+        return response
+
 
 
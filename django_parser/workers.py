@@ -0,0 +1,19 @@
+"""
+Точки входа для процессов пула разбора.
+
+Модуль не импортирует модели при загрузке: дочерние процессы, запущенные
+через spawn, сначала выполняют init_parse_worker() и только потом
+получают задачи.
+"""
+
+
+def init_parse_worker():
+    import django
+
+    django.setup()
+
+
+def parse_report(source: bytes | str):
+    from .ingest import parse_report
+
+    return parse_report(source)